@@ -0,0 +1,203 @@
+"""
+Feeds synthetic updates through the real application and records how long each takes.
+
+Import only after the environment points the bot at the fake Seedr server
+(see benchmarks/run.py): bot.config reads it at import time.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+
+from telegram import Update
+from telegram.request import BaseRequest
+
+from main import build_application
+from bot import handlers
+from bot.handlers import job_queue, user_sessions
+from bot.magnet_queue import MagnetQueue
+from bot.seedr_api import seedr_pool
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+MESSAGE_ENDPOINTS = {"sendMessage", "editMessageText", "sendDocument"}
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Answers Bot API calls locally so only the bot's own work is measured"""
+
+    def __init__(self):
+        self._message_ids = itertools.count(1)
+        self.calls = Counter()
+        # Replies the handlers sent as errors ("❌ ...")
+        self.error_replies = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[1]
+        params = request_data.parameters if request_data else {}
+        self.calls[endpoint] += 1
+
+        if endpoint == "getMe":
+            result = BOT_USER
+        elif endpoint in MESSAGE_ENDPOINTS:
+            text = params.get("text", "")
+            if text.startswith("❌"):
+                self.error_replies += 1
+            result = {
+                "message_id": params.get("message_id") or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "from": BOT_USER,
+                "text": text
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class UpdateFactory:
+    """Telegram Update objects as the Bot API would deliver them"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def _user(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+    def _message(self, user_id, text):
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return message
+
+    def message(self, user_id, text):
+        data = {"update_id": next(self._update_ids), "message": self._message(user_id, text)}
+        return Update.de_json(data, self.bot)
+
+    def callback(self, user_id, callback_data):
+        data = {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": callback_data,
+                "message": self._message(user_id, "listing")
+            }
+        }
+        return Update.de_json(data, self.bot)
+
+    def inline_query(self, user_id, query):
+        data = {
+            "update_id": next(self._update_ids),
+            "inline_query": {
+                "id": str(next(self._update_ids)),
+                "from": self._user(user_id),
+                "query": query,
+                "offset": ""
+            }
+        }
+        return Update.de_json(data, self.bot)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Driver:
+    """Runs batches of updates through the application the way the update fetcher does"""
+
+    def __init__(self):
+        self.request = FakeTelegramRequest()
+        self.app = build_application(self.request)
+        self.updates = None
+        self.phases = []
+
+    async def start(self):
+        await self.app.initialize()
+        await job_queue.start(self.app.bot)
+        self.updates = UpdateFactory(self.app.bot)
+
+    async def stop(self):
+        await job_queue.stop()
+        for session in list(user_sessions.values()):
+            await session.accounts.close()
+        user_sessions.clear()
+        await seedr_pool.reset()
+        await self.app.shutdown()
+
+    async def restart(self):
+        """Lose what a restart loses - live sessions, caches, pooled connections - but keep the session store"""
+        for session in list(user_sessions.values()):
+            await session.accounts.close()
+        user_sessions.clear()
+        handlers.magnet_queue = MagnetQueue(handlers.magnet_queue.refresh_interval, handlers.job_queue)
+        await seedr_pool.reset()
+
+    async def _feed(self, updates):
+        latencies = []
+        processor = self.app.update_processor
+
+        async def one(update):
+            started = time.perf_counter()
+            # Same path as polling/webhook: waits for a concurrency slot, then runs the handlers
+            await processor.process_update(update, self.app.process_update(update))
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(update) for update in updates))
+        # Handlers only queue adds, deletes and sends; the phase lasts until those are done
+        await job_queue.wait_idle()
+        return latencies, time.perf_counter() - started
+
+    async def setup(self, updates):
+        """Run updates without recording them (logins before the measured part)"""
+        await self._feed(updates)
+
+    async def timed(self, name, count, awaitable):
+        """Record a step that isn't made of updates (e.g. startup) as a phase of `count` items"""
+        started = time.perf_counter()
+        result = await awaitable
+        seconds = time.perf_counter() - started
+        self.phases.append({
+            "phase": name,
+            "updates": count,
+            "seconds": round(seconds, 3),
+            "updates_per_sec": round(count / seconds, 1) if seconds else 0.0,
+            "p50_ms": round(seconds * 1000, 1),
+            "p99_ms": round(seconds * 1000, 1),
+            "error_replies": 0
+        })
+        return result
+
+    async def phase(self, name, updates):
+        errors_before = self.request.error_replies
+        latencies, seconds = await self._feed(updates)
+        latencies.sort()
+        self.phases.append({
+            "phase": name,
+            "updates": len(latencies),
+            "seconds": round(seconds, 3),
+            "updates_per_sec": round(len(latencies) / seconds, 1) if seconds else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "error_replies": self.request.error_replies - errors_before
+        })
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of www.seedr.cc the bot talks to.
+
+Serves the /login page (with a CSRF token), the login endpoints, /api/folder
+GET/POST and /api/settings over a generated folder tree, with configurable
+latency and failure rate. Every username/password pair is accepted; each
+username gets its own torrents and deletions on top of the shared tree.
+
+    python -m benchmarks.fake_seedr --port 8765 --latency 0.02 --failure-rate 0.01
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import secrets
+import time
+
+import tornado.web
+
+from bot.magnets import magnet_infohash, magnet_size
+
+FOLDER_ID_BASE = 1000
+FILE_ID_BASE = 1_000_000
+FILE_SIZE = 50 * 1024 * 1024
+SPACE_MAX = 100 * 1024 * 1024 * 1024
+LOGIN_PATH = "/auth/login"
+
+
+def build_tree(folders, files, depth):
+    """Folder listings keyed by folder id (None for the root), same for every run"""
+    listings = {}
+    next_folder = FOLDER_ID_BASE
+    next_file = FILE_ID_BASE
+
+    def build(folder_id, name, parent, level):
+        nonlocal next_folder, next_file
+        listing = {"id": folder_id or 0, "name": name, "parent": parent or -1, "folders": [], "files": [], "torrents": []}
+        listings[folder_id] = listing
+        for _ in range(files):
+            listing["files"].append({
+                "id": next_file,
+                "folder_file_id": next_file,
+                "name": f"file-{next_file}.mkv" if next_file % 4 else f"file-{next_file}.sample.mkv",
+                "size": FILE_SIZE
+            })
+            next_file += 1
+        if level < depth:
+            for _ in range(folders):
+                child = next_folder
+                next_folder += 1
+                listing["folders"].append({"id": child, "name": f"folder-{child}", "size": 0, "last_update": "2024-01-01 00:00:00"})
+                build(child, f"folder-{child}", folder_id, level + 1)
+        listing["size"] = sum(f["size"] for f in listing["files"])
+
+    build(None, "root", None, 0)
+    # Folder sizes include everything below them
+    for listing in sorted(listings.values(), key=lambda l: -l["id"]):
+        for folder in listing["folders"]:
+            folder["size"] = listings[folder["id"]]["size"]
+        listing["size"] += sum(folder["size"] for folder in listing["folders"])
+    return listings
+
+
+def file_ids(listings):
+    return [file["id"] for listing in listings.values() for file in listing["files"]]
+
+
+class Account:
+    """What one username has changed on top of the shared tree"""
+
+    def __init__(self):
+        self.torrents = {}
+        self.deleted = set()
+        self.next_torrent = 1
+
+
+class FakeSeedr:
+    def __init__(self, listings, latency, failure_rate, transfer_seconds, base_url):
+        self.listings = listings
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.transfer_seconds = transfer_seconds
+        self.base_url = base_url
+        self.accounts = {}
+        # session cookie -> csrf token issued with the login page
+        self.csrf_tokens = {}
+
+    def account(self, username):
+        account = self.accounts.get(username)
+        if account is None:
+            account = self.accounts[username] = Account()
+        return account
+
+    def space_used(self, username):
+        account = self.account(username)
+        deleted = sum(
+            item["size"] for listing in self.listings.values()
+            for item in listing["files"] + listing["folders"] if item["id"] in account.deleted
+        )
+        torrents = sum(torrent["size"] for torrent in account.torrents.values())
+        return max(0, self.listings[None]["size"] - deleted + torrents)
+
+    def listing(self, username, folder_id):
+        listing = self.listings.get(folder_id)
+        if listing is None:
+            return None
+        account = self.account(username)
+        folders = [dict(f) for f in listing["folders"] if f["id"] not in account.deleted]
+        files = [
+            {**f, "url": f"{self.base_url}/dl/{f['id']}"}
+            for f in listing["files"] if f["id"] not in account.deleted
+        ]
+        for folder in folders:
+            folder["zip"] = f"{self.base_url}/zip/{folder['id']}"
+        torrents = []
+        if folder_id is None:
+            now = time.monotonic()
+            for torrent in account.torrents.values():
+                done = self.transfer_seconds and now - torrent["added"] >= self.transfer_seconds
+                if not done:
+                    torrents.append({k: v for k, v in torrent.items() if k != "added"})
+        return {**listing, "folders": folders, "files": files, "torrents": torrents}
+
+
+class Handler(tornado.web.RequestHandler):
+    def initialize(self, fake):
+        self.fake = fake
+
+    async def prepare(self):
+        if self.fake.latency:
+            await asyncio.sleep(self.fake.latency * random.uniform(0.5, 1.5))
+        if self.fake.failure_rate and random.random() < self.fake.failure_rate:
+            self.set_status(503)
+            self.finish("Service Unavailable")
+
+    def username(self):
+        cookie = self.get_cookie("remember")
+        return cookie.split(":", 1)[1] if cookie and ":" in cookie else None
+
+    def write_json(self, data, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(data))
+
+
+class LoginPageHandler(Handler):
+    def get(self):
+        session_id = self.get_cookie("PHPSESSID") or secrets.token_hex(16)
+        token = self.fake.csrf_tokens.setdefault(session_id, secrets.token_hex(20))
+        self.set_cookie("PHPSESSID", session_id)
+        self.finish(f'<html><head><meta name="csrf-token" content="{token}"></head><body>login</body></html>')
+
+
+class LoginHandler(Handler):
+    def post(self):
+        token = self.fake.csrf_tokens.get(self.get_cookie("PHPSESSID", ""))
+        username = self.get_body_argument("username", "")
+        if not token or self.get_body_argument("_token", "") != token:
+            self.write_json({"error": "CSRF token mismatch"}, 419)
+            return
+        if not username or not self.get_body_argument("password", ""):
+            self.write_json({"error": "invalid credentials"}, 401)
+            return
+        self.set_cookie("remember", f"{secrets.token_hex(8)}:{username}")
+        self.write_json({"result": True})
+
+
+class FolderHandler(Handler):
+    def get(self):
+        username = self.username()
+        if not username:
+            self.write_json({"error": "login_required"}, 401)
+            return
+        folder_id = self.get_query_argument("id", None)
+        listing = self.fake.listing(username, int(folder_id) if folder_id else None)
+        if listing is None:
+            self.write_json({"error": "folder not found"}, 404)
+            return
+        self.write_json(listing)
+
+    def post(self):
+        username = self.username()
+        if not username:
+            self.write_json({"error": "login_required"}, 401)
+            return
+        account = self.fake.account(username)
+        func = self.get_body_argument("func", "")
+
+        if func == "add_torrent":
+            magnet = self.get_body_argument("torrent_magnet", "")
+            size = magnet_size(magnet) or 0
+            if self.fake.space_used(username) + size > SPACE_MAX:
+                self.write_json({"result": "not_enough_space_added_to_wishlist"})
+                return
+            torrent_id = account.next_torrent
+            account.next_torrent += 1
+            account.torrents[torrent_id] = {
+                "id": torrent_id,
+                "name": f"torrent-{torrent_id}",
+                "hash": magnet_infohash(magnet) or hashlib.sha1(magnet.encode()).hexdigest(),
+                "progress": 0,
+                "size": size,
+                "added": time.monotonic()
+            }
+            self.write_json({"result": True, "user_torrent_id": torrent_id, "title": f"torrent-{torrent_id}"})
+        elif func == "delete":
+            ids = [int(values[0]) for key, values in self.request.body_arguments.items() if key.startswith("delete_arr")]
+            for item_id in ids:
+                account.deleted.add(item_id)
+                account.torrents.pop(item_id, None)
+            self.write_json({"result": True})
+        else:
+            self.write_json({"result": False, "error": f"unknown func {func!r}"}, 400)
+
+
+class SettingsHandler(Handler):
+    def get(self):
+        username = self.username()
+        if not username:
+            self.write_json({"error": "login_required"}, 401)
+            return
+        self.write_json({
+            "result": True,
+            "account": {"username": username, "space_max": SPACE_MAX, "space_used": self.fake.space_used(username)}
+        })
+
+
+class DownloadHandler(Handler):
+    def get(self, item_id):
+        # Small fixed body; downloads are not what these benchmarks measure
+        self.set_header("Content-Type", "application/octet-stream")
+        self.finish(b"\0" * 1024)
+
+
+def make_app(fake):
+    args = {"fake": fake}
+    return tornado.web.Application([
+        (r"/login", LoginPageHandler, args),
+        (LOGIN_PATH, LoginHandler, args),
+        (r"/api/folder", FolderHandler, args),
+        (r"/api/settings", SettingsHandler, args),
+        (r"/(?:dl|zip)/(\d+)", DownloadHandler, args)
+    ], log_function=lambda handler: None)
+
+
+def add_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.02, help="mean seconds added to every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--tree-folders", type=int, default=3, help="subfolders per folder")
+    parser.add_argument("--tree-files", type=int, default=5, help="files per folder")
+    parser.add_argument("--tree-depth", type=int, default=2, help="folder nesting depth")
+    parser.add_argument("--transfer-seconds", type=float, default=0, help="seconds until an added torrent finishes (0: never)")
+
+
+async def serve(args):
+    base_url = f"http://127.0.0.1:{args.port}"
+    listings = build_tree(args.tree_folders, args.tree_files, args.tree_depth)
+    fake = FakeSeedr(listings, args.latency, args.failure_rate, args.transfer_seconds, base_url)
+    make_app(fake).listen(args.port, "127.0.0.1", backlog=4096)
+    print(f"fake seedr on {base_url}: {len(listings)} folders, {len(file_ids(listings))} files", flush=True)
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Seedr server for benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
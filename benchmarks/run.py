@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Benchmark the bot's handlers against a local fake Seedr server.
+
+Each scenario runs in its own process (so peak RSS is per scenario) with its
+own fake server, and reports updates/sec, p50/p99 latency per phase.
+
+    python -m benchmarks.run                                 # every scenario
+    python -m benchmarks.run concurrent_users --users 200
+    python -m benchmarks.run magnet_burst --latency 0.1 --failure-rate 0.05
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.fake_seedr import build_tree, file_ids
+
+# name -> default users, fake Seedr tree (subfolders per folder, files per folder, depth)
+# and extra bot settings
+SCENARIOS = {
+    "concurrent_users": {"users": 1000, "tree": (3, 5, 2)},
+    "large_tree": {"users": 20, "tree": (8, 25, 3)},
+    "magnet_burst": {"users": 50, "tree": (3, 5, 1)},
+    "cold_start": {"users": 500, "tree": (3, 5, 2)},
+    "many_users": {"users": 10000, "tree": (3, 5, 1), "env": {"SESSION_CACHE_SIZE": "1000"}},
+    "many_users_unbounded": {
+        "users": 10000, "tree": (3, 5, 1), "env": {"SESSION_CACHE_SIZE": "0", "SESSION_IDLE_TTL": "0"}
+    }
+}
+
+MAGNETS_PER_MESSAGE = 50
+MESSAGES_PER_USER = 3
+
+
+def authorize_all(driver, users):
+    return [driver.updates.message(user, f"/authorize user{user}@example.com secret") for user in users]
+
+
+async def concurrent_users(driver, users, listings):
+    """Many users logging in and browsing at the same moment"""
+    ids = file_ids(listings)
+    top_folders = [folder["id"] for folder in listings[None]["folders"]]
+    # One login first so the winning login strategy is cached, as on a running bot
+    await driver.setup(authorize_all(driver, users[:1]))
+    await driver.phase("authorize", authorize_all(driver, users[1:]))
+    await driver.phase("list", [driver.updates.message(user, "/list") for user in users])
+    await driver.phase("getlink", [driver.updates.message(user, f"/getlink {random.choice(ids)}") for user in users])
+    await driver.phase("browse", [driver.updates.callback(user, f"ls:{random.choice(top_folders)}:0") for user in users])
+
+
+async def large_tree(driver, users, listings):
+    """Few users with big, deep accounts"""
+    ids = file_ids(listings)
+    folders = [folder_id for folder_id in listings if folder_id is not None]
+    await driver.setup(authorize_all(driver, users[:1]))
+    await driver.setup(authorize_all(driver, users[1:]))
+    await driver.phase("list", [driver.updates.message(user, "/list") for user in users])
+    # The first lookup walks the whole tree; later ones hit the index
+    await driver.phase("getlink_cold", [driver.updates.message(user, f"/getlink {ids[-1]}") for user in users])
+    await driver.phase("getlink_warm", [
+        driver.updates.message(user, f"/getlink {random.choice(ids)}") for user in users for _ in range(10)
+    ])
+    await driver.phase("browse", [
+        driver.updates.callback(user, f"ls:{random.choice(folders)}:{page}") for user in users for page in range(5)
+    ])
+    await driver.phase("search", [
+        driver.updates.message(user, f"/search {random.choice(ids) % 1000} mkv") for user in users for _ in range(10)
+    ])
+    await driver.phase("inline_search", [
+        driver.updates.inline_query(user, f"file {random.choice(ids) % 100}") for user in users for _ in range(10)
+    ])
+    await driver.phase("delete_pattern", [driver.updates.message(user, "/delete *.sample.mkv") for user in users])
+
+
+def magnet(user, n):
+    infohash = hashlib.sha1(f"{user}-{n}".encode()).hexdigest()
+    return f"magnet:?xt=urn:btih:{infohash}&dn=torrent-{n}&xl={700 * 1024 * 1024}"
+
+
+async def magnet_burst(driver, users, listings):
+    """Users pasting long lists of magnets at once"""
+    await driver.setup(authorize_all(driver, users[:1]))
+    await driver.setup(authorize_all(driver, users[1:]))
+    batches = {
+        user: [
+            "\n".join(magnet(user, m * MAGNETS_PER_MESSAGE + i) for i in range(MAGNETS_PER_MESSAGE))
+            for m in range(MESSAGES_PER_USER)
+        ]
+        for user in users
+    }
+    await driver.phase("burst", [driver.updates.message(user, text) for user in users for text in batches[user]])
+    # Resending the same lists: everything is a duplicate now
+    await driver.phase("duplicates", [driver.updates.message(user, batches[user][0]) for user in users])
+
+
+async def cold_start(driver, users, listings):
+    """First replies after a restart, without and with the startup warm-up, against steady state"""
+    from bot.handlers import restore_session, session_store
+    from bot.startup import warm_up
+
+    await driver.setup(authorize_all(driver, users[:1]))
+    await driver.setup(authorize_all(driver, users[1:]))
+
+    def list_all():
+        return [driver.updates.message(user, "/list") for user in users]
+
+    await driver.restart()
+    await driver.phase("first_list_cold", list_all())
+    await driver.restart()
+    # Time to ready: pool warmed and every stored session restored and checked
+    await driver.timed("warm_up", len(users), warm_up(session_store, restore_session))
+    await driver.phase("first_list_warm", list_all())
+    await driver.phase("steady_list", list_all())
+
+
+async def many_users(driver, users, listings):
+    """A long tail of users each coming back once: memory per live session, evicted or not"""
+    from bot.handlers import session_store
+
+    await driver.setup(authorize_all(driver, users[:1]))
+    # Logging everyone in would measure the login flow; copy the first user's stored session instead
+    record = json.dumps(await session_store.load(users[0]))
+    for user in users[1:]:
+        await session_store.save(user, json.loads(record.replace(f"user{users[0]}@", f"user{user}@")))
+    await driver.restart()
+
+    # Every session is rebuilt from the store on first use
+    await driver.phase("first_list", [driver.updates.message(user, "/list") for user in users])
+    # The most recent users are still live; the rest come back from the store
+    await driver.phase("list_again", [driver.updates.message(user, "/list") for user in users[::10]])
+
+
+SCENARIO_RUNNERS = {
+    "concurrent_users": concurrent_users,
+    "large_tree": large_tree,
+    "magnet_burst": magnet_burst,
+    "cold_start": cold_start,
+    "many_users": many_users,
+    "many_users_unbounded": many_users
+}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_seedr(port, args, tree):
+    folders, files, depth = tree
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.fake_seedr", "--port", str(port),
+            "--latency", str(args.latency), "--failure-rate", str(args.failure_rate),
+            "--tree-folders", str(folders), "--tree-files", str(files), "--tree-depth", str(depth)
+        ],
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    # The server prints one line once it is listening
+    process.stdout.readline()
+    return process
+
+
+async def run_scenario(name, args):
+    """Runs inside the child process"""
+    # Imported here: bot.config must see the benchmark environment first
+    from benchmarks.driver import Driver
+
+    scenario = SCENARIOS[name]
+    users = list(range(1, (args.users or scenario["users"]) + 1))
+    listings = build_tree(*scenario["tree"])
+    random.seed(0)
+
+    driver = Driver()
+    await driver.start()
+    rss_start = peak_rss_mb()
+    try:
+        await SCENARIO_RUNNERS[name](driver, users, listings)
+    finally:
+        await driver.stop()
+    return {
+        "scenario": name,
+        "users": len(users),
+        "rss_start_mb": rss_start,
+        "rss_peak_mb": peak_rss_mb(),
+        "phases": driver.phases,
+        "telegram_calls": dict(driver.request.calls)
+    }
+
+
+def child(args):
+    name = args.scenarios[0]
+    port = free_port()
+    server = start_fake_seedr(port, args, SCENARIOS[name]["tree"])
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": "123456:benchmark",
+        "SEEDR_BASE_URL": f"http://127.0.0.1:{port}",
+        "SESSION_BACKEND": "memory",
+        "JOB_DB_PATH": ":memory:",
+        "MAX_CONCURRENT_UPDATES": str(args.concurrency),
+        # The fake Bot API has no flood limits to respect
+        "TG_GLOBAL_RATE": "1000000",
+        "TG_CHAT_INTERVAL": "0",
+        "TG_GROUP_INTERVAL": "0",
+        "METRICS_PORT": "0",
+        **SCENARIOS[name].get("env", {})
+    })
+    # The bot logs every login step; keep that out of the report
+    report = sys.stdout
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+    try:
+        result = asyncio.run(run_scenario(name, args))
+    finally:
+        sys.stdout = report
+        server.terminate()
+        server.wait()
+    print(json.dumps(result))
+
+
+def print_report(result):
+    growth = f"after startup {result['rss_start_mb']} MB"
+    if result["users"] >= 1000:
+        per_10k = (result["rss_peak_mb"] - result["rss_start_mb"]) / result["users"] * 10000
+        growth += f", +{per_10k:.0f} MB per 10k users"
+    print(f"\n== {result['scenario']} ({result['users']} users) peak RSS {result['rss_peak_mb']} MB ({growth})")
+    print(f"{'phase':<16}{'updates':>9}{'upd/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for phase in result["phases"]:
+        print(f"{phase['phase']:<16}{phase['updates']:>9}{phase['updates_per_sec']:>10}"
+              f"{phase['p50_ms']:>10}{phase['p99_ms']:>10}{phase['error_replies']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seedr bot benchmarks")
+    parser.add_argument("scenarios", nargs="*", help=f"scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--users", type=int, default=0, help="override the scenario's number of users")
+    parser.add_argument("--latency", type=float, default=0.02, help="mean fake Seedr response time in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of Seedr requests failing with 503")
+    parser.add_argument("--concurrency", type=int, default=64, help="MAX_CONCURRENT_UPDATES for the bot")
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own output")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    if args.child:
+        child(args)
+        return
+
+    passthrough = [
+        "--users", str(args.users), "--latency", str(args.latency),
+        "--failure-rate", str(args.failure_rate), "--concurrency", str(args.concurrency)
+    ] + (["--verbose"] if args.verbose else [])
+
+    for name in args.scenarios or list(SCENARIOS):
+        started = time.monotonic()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--child", name] + passthrough,
+            stdout=subprocess.PIPE, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["wall_seconds"] = round(time.monotonic() - started, 1)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+from bot.search_index import SearchIndex
+
+
+class IndexNode:
+    """One file or folder anywhere in the account tree"""
+
+    __slots__ = ("id", "name", "parent_id", "is_folder", "size", "link", "last_update")
+
+    def __init__(self, item, parent_id):
+        self.id = item.id
+        self.parent_id = parent_id
+        self.is_folder = item.is_folder
+        self.update(item)
+
+    def update(self, item):
+        self.name = item.name
+        self.size = item.size
+        # Direct link for files, zip link for folders
+        self.link = item.link
+        self.last_update = item.last_update
+
+
+class AccountIndex:
+    """id -> node map of a whole Seedr account, refreshed subtree by subtree"""
+
+    def __init__(self, seedr, ttl, concurrency):
+        self.seedr = seedr
+        self.ttl = ttl
+        self.nodes = {}
+        # folder id (None for the root) -> ids of its direct children
+        self._children = {}
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._fetch_slots = asyncio.Semaphore(concurrency)
+        # Name search over the same nodes, updated as they are
+        self.search_index = SearchIndex()
+        self._background_refresh = None
+
+    def is_fresh(self):
+        return time.monotonic() - self._refreshed_at < self.ttl
+
+    def invalidate(self):
+        """Force the next lookup to re-check the tree"""
+        self._refreshed_at = 0.0
+
+    async def ensure_fresh(self):
+        if not self.is_fresh():
+            await self.refresh()
+
+    async def lookup(self, item_id):
+        """Return the node for item_id at any depth, or None"""
+        await self.ensure_fresh()
+        return self.nodes.get(str(item_id))
+
+    async def search(self, query, limit):
+        """(score, node) for names matching query, best first; a stale index answers now and refreshes in the background"""
+        if not self.nodes:
+            await self.ensure_fresh()
+        elif not self.is_fresh() and (self._background_refresh is None or self._background_refresh.done()):
+            self._background_refresh = asyncio.create_task(self.refresh())
+            # A failed refresh is retried by the next query; don't log it as unretrieved
+            self._background_refresh.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return [
+            (score, self.nodes[node_id])
+            for score, node_id in self.search_index.ranked(query, limit) if node_id in self.nodes
+        ]
+
+    async def refresh(self):
+        """Re-read the root and descend only into folders whose metadata changed"""
+        async with self._lock:
+            # Someone else refreshed while we waited for the lock
+            if self.is_fresh():
+                return
+            root = await self.seedr.list_contents()
+            await self._apply_listing(None, root)
+            self._refreshed_at = time.monotonic()
+
+    async def _fetch_folder(self, folder_id):
+        try:
+            async with self._fetch_slots:
+                contents = await self.seedr.list_contents(folder_id)
+            await self._apply_listing(folder_id, contents)
+        except Exception:
+            # Forget the folder's metadata so the next refresh retries this subtree
+            node = self.nodes.get(folder_id)
+            if node:
+                node.last_update = None
+            raise
+
+    async def _apply_listing(self, folder_id, contents):
+        if contents.error:
+            # An error answer is not an empty folder: keep what we know and stay stale
+            raise Exception(f"Seedr refused the listing: {contents.error}")
+        seen = set()
+        changed_folders = []
+
+        for folder in contents.folders:
+            node = self.nodes.get(folder.id)
+            if node is None:
+                node = IndexNode(folder, folder_id)
+                self.nodes[node.id] = node
+                changed_folders.append(node.id)
+            else:
+                if (node.last_update, node.size) != (folder.last_update, folder.size):
+                    changed_folders.append(node.id)
+                node.parent_id = folder_id
+                node.update(folder)
+            self.search_index.add(node.id, node.name)
+            seen.add(node.id)
+
+        for file in contents.files:
+            node = self.nodes.get(file.id)
+            if node is None:
+                node = IndexNode(file, folder_id)
+                self.nodes[node.id] = node
+            else:
+                node.parent_id = folder_id
+                node.update(file)
+            self.search_index.add(node.id, node.name)
+            seen.add(node.id)
+
+        for gone in self._children.get(folder_id, set()) - seen:
+            self._drop(gone)
+        self._children[folder_id] = seen
+
+        # Subfolders are fetched concurrently; unchanged subtrees are kept as-is
+        await asyncio.gather(*(self._fetch_folder(child) for child in changed_folders))
+
+    def _drop(self, item_id):
+        """Remove a node and everything below it"""
+        self.nodes.pop(item_id, None)
+        self.search_index.remove(item_id)
+        for child in self._children.pop(item_id, set()):
+            self._drop(child)
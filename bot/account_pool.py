@@ -0,0 +1,130 @@
+import asyncio
+
+from bot.listing import Listing
+from bot.magnets import magnet_size
+from bot.seedr_api import SeedrAPI
+
+
+def active_transfers(seedr):
+    """Torrents in the cached root listing; 0 when it isn't cached"""
+    contents = seedr.folder_cache.peek(None)
+    return len(contents.torrents) if contents else 0
+
+
+class AccountPool:
+    """Every Seedr account one Telegram user has attached, used as one"""
+
+    def __init__(self):
+        # username -> SeedrAPI, in the order they were attached
+        self.accounts = {}
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def items(self):
+        return list(self.accounts.items())
+
+    def attach(self, username, seedr):
+        """Add an account; returns the client it replaces, if it was already attached"""
+        previous = self.accounts.pop(username, None)
+        self.accounts[username] = seedr
+        return previous
+
+    def detach(self, username):
+        return self.accounts.pop(username, None)
+
+    def export_state(self):
+        return [{"username": username, **seedr.export_state()} for username, seedr in self.accounts.items()]
+
+    @classmethod
+    def from_state(cls, record):
+        """Rebuild from a stored session record (older records hold a single account)"""
+        pool = cls()
+        for state in record.get("accounts") or [record]:
+            pool.attach(state.get("username"), SeedrAPI.from_state(state))
+        return pool
+
+    async def close(self):
+        await asyncio.gather(*(seedr.close() for seedr in self.accounts.values()))
+
+    async def refresh(self, magnet_queue):
+        """Read every account's space and transfers at once (cached values are reused)"""
+
+        async def refresh_one(username, seedr):
+            await magnet_queue.refresh(username, seedr)
+            await seedr.list_contents()
+
+        await asyncio.gather(*(refresh_one(u, s) for u, s in self.accounts.items()), return_exceptions=True)
+
+    async def assign(self, magnet_queue, magnets):
+        """Split magnets over the accounts: {username: magnets}.
+
+        Each magnet goes to an account it fits on, then the one with the fewest
+        active transfers, then the most free space - counting what this batch
+        already put there.
+        """
+        if len(self.accounts) > 1:
+            await self.refresh(magnet_queue)
+        planned = {username: [] for username in self.accounts}
+        planned_bytes = dict.fromkeys(self.accounts, 0)
+
+        for magnet in magnets:
+            size = magnet_size(magnet)
+
+            def rank(username):
+                free = magnet_queue.free_space(username)
+                if free is not None:
+                    free -= planned_bytes[username]
+                fits = size is None or free is None or size <= free
+                active = active_transfers(self.accounts[username]) + len(planned[username])
+                return fits, -active, free if free is not None else -1
+
+            username = max(self.accounts, key=rank)
+            planned[username].append(magnet)
+            planned_bytes[username] += size or 0
+        return {username: batch for username, batch in planned.items() if batch}
+
+    async def lookup(self, item_id):
+        """(username, seedr, node) for an item in any account, or (None, None, None)"""
+        items = self.items()
+        nodes = await asyncio.gather(*(seedr.index.lookup(item_id) for _, seedr in items), return_exceptions=True)
+        for (username, seedr), node in zip(items, nodes):
+            if node and not isinstance(node, Exception):
+                return username, seedr, node
+        errors = [node for node in nodes if isinstance(node, Exception)]
+        if errors:
+            raise errors[0]
+        return None, None, None
+
+    async def owner_of(self, item_id):
+        """(username, seedr) holding item_id; cached listings first, full lookup only if needed"""
+        item_id = str(item_id)
+        for username, seedr in self.accounts.items():
+            if item_id in seedr.index.nodes or seedr.folder_cache.peek(item_id) is not None:
+                return username, seedr
+            if any(item_id in contents for _, contents in seedr.folder_cache.items()):
+                return username, seedr
+        username, seedr, _ = await self.lookup(item_id)
+        return username, seedr
+
+    async def root_listing(self):
+        """Root folders, files and torrents of every account in one listing"""
+        items = self.items()
+        listings = await asyncio.gather(*(seedr.list_contents() for _, seedr in items))
+        if len(items) == 1:
+            return listings[0]
+
+        # Tag entries with their account so the combined view stays readable
+        return Listing.merge([(username, contents) for (username, _), contents in zip(items, listings)])
+
+    async def search(self, query, limit):
+        """(username, node) pairs across accounts, best matches first"""
+        items = self.items()
+        results = await asyncio.gather(*(seedr.index.search(query, limit) for _, seedr in items))
+        scored = [
+            (score, username, node)
+            for (username, _), matches in zip(items, results)
+            for score, node in matches
+        ]
+        scored.sort(key=lambda entry: entry[0], reverse=True)
+        return [(username, node) for _, username, node in scored[:limit]]
@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+
+
+class CacheCounters:
+    """Hits and misses summed over many caches, e.g. the folder caches of every account"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after ttl seconds; hits and misses also go to totals"""
+
+    def __init__(self, ttl, maxsize, totals=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.totals = totals
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            if self.totals:
+                self.totals.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if self.totals:
+            self.totals.hits += 1
+        return entry[1]
+
+    def peek(self, key, default=None):
+        """Like get, but without touching LRU order or counters (for bookkeeping lookups)"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def items(self):
+        """Live (key, value) pairs, without touching LRU order or counters"""
+        now = time.monotonic()
+        return [(key, entry[1]) for key, entry in self._entries.items() if entry[0] >= now]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
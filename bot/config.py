@@ -4,3 +4,117 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+
+# Seedr site; overridden by the benchmarks to point at a local fake server
+SEEDR_BASE_URL = os.getenv("SEEDR_BASE_URL", "https://www.seedr.cc").rstrip("/")
+
+# Upper bound on login endpoint/field combinations probed per /authorize
+LOGIN_MAX_ATTEMPTS = int(os.getenv("SEEDR_LOGIN_MAX_ATTEMPTS", "16"))
+
+# Where authenticated sessions are kept across restarts: "sqlite" or "memory"
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+
+# Live sessions kept in memory (least recently used beyond this are evicted) and seconds
+# an unused one stays live; evicted sessions are rebuilt from the store (0 = no limit)
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "5000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+
+# Per-account folder listing cache: seconds a listing stays fresh, and max folders kept
+FOLDER_CACHE_TTL = float(os.getenv("FOLDER_CACHE_TTL", "30"))
+FOLDER_CACHE_SIZE = int(os.getenv("FOLDER_CACHE_SIZE", "256"))
+
+# How many subfolders the account index fetches at once while walking the tree
+INDEX_FETCH_CONCURRENCY = int(os.getenv("INDEX_FETCH_CONCURRENCY", "8"))
+
+# Max updates handled at the same time
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
+
+# Worker processes (each with its own event loop); updates are sharded by user
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# Webhook mode (python main.py --mode webhook)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # public base URL Telegram posts to
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+
+# Entries per /list page
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "20"))
+
+# Results per /search reply or inline query (Telegram allows at most 50 inline)
+SEARCH_RESULT_LIMIT = min(50, int(os.getenv("SEARCH_RESULT_LIMIT", "20")))
+
+# Torrents submitted to Seedr at once when a message holds many magnets
+MAGNET_CONCURRENCY = int(os.getenv("MAGNET_CONCURRENCY", "4"))
+
+# Transfer poller, per account: seconds between polls while it has torrents active, and the idle backoff ceiling
+POLL_INTERVAL_ACTIVE = float(os.getenv("POLL_INTERVAL_ACTIVE", "10"))
+POLL_INTERVAL_IDLE_MAX = float(os.getenv("POLL_INTERVAL_IDLE_MAX", "300"))
+
+# Seconds between account space reads; adds and deletes are accounted for in between
+QUOTA_REFRESH_INTERVAL = float(os.getenv("QUOTA_REFRESH_INTERVAL", "300"))
+
+# Items per delete_arr POST when /delete matches many items
+DELETE_BATCH_SIZE = int(os.getenv("DELETE_BATCH_SIZE", "50"))
+
+# Background jobs (adding, deleting, downloading, sending): SQLite file they survive
+# restarts in (":memory:" keeps them in-process only), worker tasks, jobs running at
+# once per Seedr account, attempts before giving up and seconds before the first retry
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+JOB_ACCOUNT_CONCURRENCY = int(os.getenv("JOB_ACCOUNT_CONCURRENCY", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+
+# Ranged downloader: parallel connections, bytes per Range request, retries per chunk,
+# total bytes/s cap (0 = unlimited) and where mirrored files go
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+DOWNLOAD_BANDWIDTH_LIMIT = int(os.getenv("DOWNLOAD_BANDWIDTH_LIMIT", "0"))
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", "downloads")
+
+# /send: concurrent transfers, max bytes per uploaded part (Bot API limit is 50 MB;
+# raise it when using a local Bot API server) and upload timeout in seconds
+SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "2"))
+TELEGRAM_UPLOAD_LIMIT = int(os.getenv("TELEGRAM_UPLOAD_LIMIT", str(49 * 1024 * 1024)))
+SEND_UPLOAD_TIMEOUT = float(os.getenv("SEND_UPLOAD_TIMEOUT", "300"))
+
+# Seedr HTTP transport: timeouts (seconds), retries for idempotent calls with jittered
+# exponential backoff, per-host circuit breaker, and the connection pool shared by all
+# accounts (max connections, idle ones kept, seconds an idle one stays open)
+SEEDR_CONNECT_TIMEOUT = float(os.getenv("SEEDR_CONNECT_TIMEOUT", "5"))
+SEEDR_READ_TIMEOUT = float(os.getenv("SEEDR_READ_TIMEOUT", "20"))
+SEEDR_LOGIN_TIMEOUT = float(os.getenv("SEEDR_LOGIN_TIMEOUT", "30"))
+SEEDR_DOWNLOAD_TIMEOUT = float(os.getenv("SEEDR_DOWNLOAD_TIMEOUT", "60"))
+SEEDR_MAX_RETRIES = int(os.getenv("SEEDR_MAX_RETRIES", "3"))
+SEEDR_BACKOFF_BASE = float(os.getenv("SEEDR_BACKOFF_BASE", "0.5"))
+SEEDR_BACKOFF_MAX = float(os.getenv("SEEDR_BACKOFF_MAX", "30"))
+SEEDR_BREAKER_THRESHOLD = int(os.getenv("SEEDR_BREAKER_THRESHOLD", "5"))
+SEEDR_BREAKER_RESET = float(os.getenv("SEEDR_BREAKER_RESET", "30"))
+SEEDR_POOL_SIZE = int(os.getenv("SEEDR_POOL_SIZE", "100"))
+SEEDR_POOL_KEEPALIVE = int(os.getenv("SEEDR_POOL_KEEPALIVE", "20"))
+SEEDR_KEEPALIVE_EXPIRY = float(os.getenv("SEEDR_KEEPALIVE_EXPIRY", "60"))
+
+# Startup: connections opened to Seedr before the bot reports ready (and kept open),
+# stored sessions restored and checked (most recently used first), how many at once,
+# and how long startup may take before the bot goes ready with the rest restored lazily
+SEEDR_WARM_CONNECTIONS = int(os.getenv("SEEDR_WARM_CONNECTIONS", "4"))
+STARTUP_RESTORE_LIMIT = int(os.getenv("STARTUP_RESTORE_LIMIT", "1000"))
+STARTUP_RESTORE_CONCURRENCY = int(os.getenv("STARTUP_RESTORE_CONCURRENCY", "32"))
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", "30"))
+
+# Outgoing Telegram messages: max per second overall, and min seconds between
+# messages to one private chat / one group
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+TG_CHAT_INTERVAL = float(os.getenv("TG_CHAT_INTERVAL", "1"))
+TG_GROUP_INTERVAL = float(os.getenv("TG_GROUP_INTERVAL", "3"))
+
+# Instrumentation: Prometheus text endpoint (0 disables it), Telegram user ids allowed
+# to run /stats, and the fraction of updates traced span by span
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+ADMIN_IDS = {int(i) for i in os.getenv("ADMIN_IDS", "").split(",") if i.strip()}
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+import httpx
+
+STREAM_BLOCK = 64 * 1024
+# Streamed blocks are gathered up to this size before each (threaded) disk write
+WRITE_BLOCK = 1024 * 1024
+
+
+class BandwidthLimiter:
+    """Token bucket shared by all workers to cap total bytes per second"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount):
+        if not self.rate:
+            return
+        # A block bigger than one second's budget would never fit in the bucket
+        amount = min(amount, self.rate)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+class RangedDownloader:
+    """Parallel HTTP Range downloader that writes chunks in place and can resume"""
+
+    def __init__(self, client=None, workers=4, chunk_size=8 * 1024 * 1024, retries=3, bandwidth_limit=0):
+        self.client = client
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.limiter = BandwidthLimiter(bandwidth_limit)
+
+    async def download(self, url, path, progress=None):
+        """Fetch url into path; awaits progress(done_bytes, total_bytes) as chunks land"""
+        owns_client = self.client is None
+        client = self.client or httpx.AsyncClient(follow_redirects=True)
+        started = time.monotonic()
+        try:
+            size = await self._probe_size(client, url)
+            if size is None:
+                # No Range support or unknown length: single stream
+                await self._download_single(client, url, path)
+                size = os.path.getsize(path)
+            else:
+                await self._download_ranged(client, url, path, size, progress)
+        finally:
+            if owns_client:
+                await client.aclose()
+
+        seconds = time.monotonic() - started
+        return {"path": path, "size": size, "seconds": seconds, "bytes_per_sec": size / seconds if seconds else 0}
+
+    async def _probe_size(self, client, url):
+        """Total size if the server honours Range requests, else None"""
+        async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+            if response.status_code != 206:
+                return None
+            content_range = response.headers.get("content-range", "")
+            total = content_range.rpartition("/")[2]
+            return int(total) if total.isdigit() else None
+
+    async def _download_single(self, client, url, path):
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                buffer = bytearray()
+                async for data in response.aiter_bytes(STREAM_BLOCK):
+                    await self.limiter.acquire(len(data))
+                    buffer += data
+                    if len(buffer) >= WRITE_BLOCK:
+                        await asyncio.to_thread(f.write, bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(f.write, bytes(buffer))
+
+    async def _download_ranged(self, client, url, path, size, progress):
+        manifest_path = f"{path}.manifest.json"
+        chunk_count = max(1, -(-size // self.chunk_size))
+        done = self._load_manifest(manifest_path, path, size)
+
+        if done is None:
+            done = set()
+            # Preallocate so every worker can write at its own offset
+            await asyncio.to_thread(self._preallocate, path, size)
+            await asyncio.to_thread(self._save_manifest, manifest_path, url, size, sorted(done))
+
+        pending = asyncio.Queue()
+        for index in range(chunk_count):
+            if index not in done:
+                pending.put_nowait(index)
+        done_bytes = sum(min(self.chunk_size, size - i * self.chunk_size) for i in done)
+
+        # Manifest saves share one temp file, so one at a time
+        manifest_lock = asyncio.Lock()
+        fd = os.open(path, os.O_WRONLY)
+        try:
+            async def worker():
+                nonlocal done_bytes
+                while not pending.empty():
+                    index = pending.get_nowait()
+                    written = await self._fetch_chunk(client, url, fd, index, size)
+                    done.add(index)
+                    done_bytes += written
+                    async with manifest_lock:
+                        await asyncio.to_thread(self._save_manifest, manifest_path, url, size, sorted(done))
+                    if progress:
+                        await progress(done_bytes, size)
+
+            tasks = [asyncio.create_task(worker()) for _ in range(min(self.workers, pending.qsize() or 1))]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # One chunk failed (or we were cancelled): stop the other workers before the fd goes away
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        finally:
+            os.close(fd)
+
+        os.remove(manifest_path)
+
+    async def _fetch_chunk(self, client, url, fd, index, size):
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, size) - 1
+
+        for attempt in range(self.retries + 1):
+            offset = start
+            try:
+                async with client.stream("GET", url, headers={"Range": f"bytes={start}-{end}"}) as response:
+                    if response.status_code != 206:
+                        raise Exception(f"range request returned {response.status_code}")
+                    # Stream to the file offset in WRITE_BLOCK pieces; never hold a whole chunk in memory
+                    buffer = bytearray()
+                    async for data in response.aiter_bytes(STREAM_BLOCK):
+                        await self.limiter.acquire(len(data))
+                        buffer += data
+                        if len(buffer) >= WRITE_BLOCK:
+                            offset += await self._write(fd, bytes(buffer), offset)
+                            buffer.clear()
+                    if buffer:
+                        offset += await self._write(fd, bytes(buffer), offset)
+                if offset != end + 1:
+                    raise Exception(f"chunk {index} ended early at byte {offset}")
+                return end + 1 - start
+            except Exception as e:
+                if attempt == self.retries:
+                    raise Exception(f"Chunk {index} failed after {attempt + 1} attempts: {str(e)}")
+                await asyncio.sleep(min(30, 2 ** attempt) * random.uniform(0.5, 1.5))
+
+    @staticmethod
+    async def _write(fd, data, offset):
+        """pwrite in a thread; a cancelled worker still waits for it, so the fd is never closed mid-write"""
+        write = asyncio.ensure_future(asyncio.to_thread(RangedDownloader._pwrite_all, fd, data, offset))
+        try:
+            await asyncio.shield(write)
+        except asyncio.CancelledError:
+            await write
+            raise
+        return len(data)
+
+    @staticmethod
+    def _pwrite_all(fd, data, offset):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+
+    @staticmethod
+    def _preallocate(path, size):
+        with open(path, "wb") as f:
+            f.truncate(size)
+
+    def _load_manifest(self, manifest_path, path, size):
+        """Completed chunk indices from a previous run, if it was for the same file"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("size") != size or manifest.get("chunk_size") != self.chunk_size:
+            return None
+        return set(manifest.get("done", []))
+
+    def _save_manifest(self, manifest_path, url, size, done):
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"url": url, "size": size, "chunk_size": self.chunk_size, "done": done}, f)
+        os.replace(tmp_path, manifest_path)
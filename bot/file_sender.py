@@ -0,0 +1,135 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from bot.outbox import edit_in_background
+
+STREAM_BLOCK = 64 * 1024
+# Streamed blocks are gathered up to this size before each (threaded) spool write
+WRITE_BLOCK = 1024 * 1024
+
+
+def _stream_size(response, offset):
+    """Full size of the file behind a (possibly ranged) response, or None if it doesn't say"""
+    if response.status_code == 206:
+        total = response.headers.get("content-range", "").rpartition("/")[2]
+        if total.isdigit():
+            return int(total)
+    length = response.headers.get("content-length", "")
+    # A compressed body's length says nothing about the file
+    if not length.isdigit() or response.headers.get("content-encoding", "identity") != "identity":
+        return None
+    return int(length) + (offset if response.status_code == 206 else 0)
+
+
+class FileSender:
+    """Streams Seedr files into Telegram uploads, splitting anything over the upload limit"""
+
+    def __init__(self, concurrency, part_size, upload_timeout, progress_interval=3.0):
+        self.part_size = part_size
+        self.upload_timeout = upload_timeout
+        self.progress_interval = progress_interval
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def send(self, bot, chat_id, seedr, item_id, status_msg, skip_parts=0, on_part=None):
+        """Upload item_id to chat_id, editing status_msg with throttled progress.
+
+        Parts up to skip_parts were sent by an earlier attempt and are not sent
+        again; on_part(part) is awaited after each part lands.
+        """
+        node = await seedr.index.lookup(item_id)
+        if not node or not node.link:
+            raise Exception("File not found or no download link available")
+
+        name = os.path.basename(node.name) + (".zip" if node.is_folder else "")
+        # Known once the response arrives; Seedr's listed size is off for zips and sometimes files
+        total = parts = None
+
+        if self._slots.locked():
+            await status_msg.edit_text(f"⏳ Queued: {name}")
+
+        async with self._slots:
+            sent = skip_parts * self.part_size
+            part = skip_parts
+            last_edit = 0.0
+
+            async def report(force=False):
+                nonlocal last_edit
+                if not force and time.monotonic() - last_edit < self.progress_interval:
+                    return
+                last_edit = time.monotonic()
+                percent = f"{sent * 100 // total}%" if total else f"{round(sent / 1024 / 1024, 1)} MB"
+                part_info = f" (part {part}/{parts})" if parts and parts > 1 else ""
+                try:
+                    await edit_in_background(status_msg, f"📤 Sending {name}: {percent}{part_info}")
+                except Exception:
+                    pass
+
+            # Spool one part at a time to disk so memory stays bounded by a single part
+            headers = {"Range": f"bytes={sent}-"} if sent else None
+            async with seedr.transport.stream("GET", node.link, call="send_file", headers=headers) as response:
+                response.raise_for_status()
+                total = _stream_size(response, sent)
+                parts = max(1, -(-total // self.part_size)) if total else None
+                # A server that ignores Range sends the parts we already sent too
+                discard = sent if response.status_code != 206 else 0
+                spool = None
+                # Bytes of the current part, and those of them not written to the spool yet
+                spooled = 0
+                pending = bytearray()
+                try:
+                    async for data in response.aiter_bytes(STREAM_BLOCK):
+                        if discard:
+                            skipped = min(discard, len(data))
+                            discard -= skipped
+                            data = data[skipped:]
+                        while data:
+                            if spool is None:
+                                spool = await asyncio.to_thread(tempfile.TemporaryFile)
+                                part += 1
+                                spooled = 0
+                            piece = data[:self.part_size - spooled]
+                            data = data[len(piece):]
+                            pending += piece
+                            spooled += len(piece)
+                            sent += len(piece)
+                            if len(pending) >= WRITE_BLOCK or spooled >= self.part_size:
+                                await asyncio.to_thread(spool.write, bytes(pending))
+                                pending.clear()
+                            if spooled >= self.part_size:
+                                await self._upload(bot, chat_id, spool, name, part, parts)
+                                spool.close()
+                                spool = None
+                                if on_part:
+                                    await on_part(part)
+                            await report()
+                    if spool is not None:
+                        if pending:
+                            await asyncio.to_thread(spool.write, bytes(pending))
+                        await self._upload(bot, chat_id, spool, name, part, parts or part)
+                        if on_part:
+                            await on_part(part)
+                finally:
+                    if spool is not None:
+                        spool.close()
+
+            await report(force=True)
+            return part
+
+    async def _upload(self, bot, chat_id, spool, name, part, parts):
+        spool.seek(0)
+        if parts == 1 and part == 1:
+            filename, caption = name, None
+        else:
+            filename = f"{name}.{part:03d}"
+            numbering = f"{part}/{parts}" if parts else f"{part}"
+            caption = f"Part {numbering} - join with: cat '{name}'.0* > '{name}'"
+        await bot.send_document(
+            chat_id=chat_id,
+            document=spool,
+            filename=filename,
+            caption=caption,
+            write_timeout=self.upload_timeout,
+            read_timeout=self.upload_timeout
+        )
@@ -1,11 +1,181 @@
-from telegram import Update
+from telegram import (
+    Update, Chat, Message, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle,
+    InlineQueryResultsButton, InputTextMessageContent
+)
 from telegram.ext import ContextTypes
-from bot.seedr_api import SeedrAPI
+from bot.seedr_api import SeedrAPI, folder_cache_totals, flight_totals
+from bot.account_pool import AccountPool, active_transfers
+from bot.magnets import extract_magnets, dedupe_magnets, magnet_from_torrent, magnet_size
+from bot.session_store import create_session_store
+from bot.sessions import Session, SessionCache
+from bot.transfer_poller import TransferPoller
+from bot.file_sender import FileSender
+from bot.magnet_queue import MagnetQueue, ADDED, QUEUED, FAILED
+from bot.job_queue import JobQueue, JobStore, JobFailed
+from bot.outbox import BACKGROUND, edit_in_background
+from bot.metrics import instrument, metrics
+from bot.config import (
+    SESSION_BACKEND, SESSION_DB_PATH, LIST_PAGE_SIZE, SEARCH_RESULT_LIMIT, MAGNET_CONCURRENCY,
+    POLL_INTERVAL_ACTIVE, POLL_INTERVAL_IDLE_MAX, QUOTA_REFRESH_INTERVAL, DELETE_BATCH_SIZE,
+    SEND_CONCURRENCY, TELEGRAM_UPLOAD_LIMIT, SEND_UPLOAD_TIMEOUT, DOWNLOAD_DIR,
+    JOB_DB_PATH, JOB_WORKERS, JOB_ACCOUNT_CONCURRENCY, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF,
+    SESSION_CACHE_SIZE, SESSION_IDLE_TTL,
+    ADMIN_IDS, TRACE_SAMPLE_RATE
+)
+from datetime import datetime, timezone
+import asyncio
+import fnmatch
 import re
+import time
 
-# Store user sessions
-user_sessions = {}
+# Live user sessions; idle ones are evicted and rebuilt from session_store on demand
+user_sessions = SessionCache(SESSION_CACHE_SIZE, SESSION_IDLE_TTL)
 
+# Authenticated sessions (cookies, token, metadata) persisted across restarts
+session_store = create_session_store(SESSION_BACKEND, SESSION_DB_PATH)
+
+# Watches transfers of every authorized account and pushes completion notices
+transfer_poller = TransferPoller(user_sessions, POLL_INTERVAL_ACTIVE, POLL_INTERVAL_IDLE_MAX)
+
+# Bounded pool of Seedr -> Telegram file transfers
+file_sender = FileSender(SEND_CONCURRENCY, TELEGRAM_UPLOAD_LIMIT, SEND_UPLOAD_TIMEOUT)
+
+# Adds, deletes, downloads and sends run here, outside the update handlers, and survive restarts
+job_queue = JobQueue(
+    JobStore(JOB_DB_PATH), JOB_WORKERS, JOB_ACCOUNT_CONCURRENCY, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF
+)
+
+# Magnets waiting for free space, per Seedr account; saved next to the jobs
+magnet_queue = MagnetQueue(QUOTA_REFRESH_INTERVAL, job_queue)
+
+JOB_STATE_ICONS = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌"}
+
+def _session_record(session):
+    """What gets persisted for a session - never the password"""
+    return {
+        "chat_id": session.chat_id,
+        "accounts": session.accounts.export_state()
+    }
+
+def _track_session(user_id, session):
+    """Write the session back to the store whenever Seedr refreshes the cookies of any of its accounts"""
+    async def save(seedr):
+        await session_store.save(user_id, _session_record(session))
+    for _, seedr in session.accounts.items():
+        seedr.on_state_change = save
+
+async def get_session(user_id):
+    """Return the user's live session, restoring it from the store on first use"""
+    session = user_sessions.get(user_id)
+    if session:
+        return session
+    
+    record = await session_store.load(user_id)
+    if not record:
+        return None
+    
+    restored = Session(AccountPool.from_state(record), record.get("chat_id") or user_id)
+    session = user_sessions.setdefault(user_id, restored)
+    if session is restored:
+        _track_session(user_id, session)
+    else:
+        # Another update for this user restored it first
+        await restored.accounts.close()
+    return session
+
+def _session_pinned(session):
+    """Sessions whose transfers are being watched or whose magnets wait for space stay live"""
+    return any(
+        transfer_poller.is_active(account) or magnet_queue.pending(account)
+        for account, _ in session.accounts.items()
+    )
+
+async def _evict_session(user_id, session):
+    """Save the cookies of an evicted session; its clients share the pool, so there is nothing to close"""
+    try:
+        await session_store.save(user_id, _session_record(session))
+    except Exception as e:
+        print(f"Saving evicted session {user_id} failed: {str(e)}")
+
+user_sessions.keep = _session_pinned
+user_sessions.on_evict = _evict_session
+
+async def restore_session(user_id):
+    """Load a stored session and check every account still answers; True if all do (startup warm-up)"""
+    session = await get_session(user_id)
+    if not session:
+        return False
+    accounts = session.accounts.items()
+    # The root listings and quotas fetched here also answer the user's first /list and magnet
+    listings = await asyncio.gather(*(seedr.list_contents() for _, seedr in accounts))
+    await asyncio.gather(*(magnet_queue.refresh(account, seedr) for account, seedr in accounts))
+    return all(not contents.error for contents in listings)
+
+def _format_size(size):
+    return f"{round(size / 1024 / 1024 / 1024, 2)} GB" if size is not None else "unknown size"
+
+async def _drain_queue(bot, account, seedr):
+    """Space was freed: add held magnets that fit now and tell their chats"""
+    added = False
+    for item, outcome, detail in await magnet_queue.drain(account, seedr):
+        if outcome == ADDED:
+            added = True
+            text = f"✅ Queued torrent added: {item.name}"
+        else:
+            text = f"❌ Failed to add queued torrent {item.name}: {detail}"
+        try:
+            await bot.send_message(chat_id=item.chat_id, text=text, rate_limit_args={"priority": BACKGROUND})
+        except Exception as e:
+            print(f"Failed to notify {item.chat_id}: {str(e)}")
+    if added:
+        transfer_poller.wake(account)
+
+# Finished transfers free space for queued magnets
+transfer_poller.on_finished = _drain_queue
+
+async def restore_held_magnets(bot):
+    """Hold magnets saved before a restart again; their users' sessions come up so the accounts are watched"""
+    owners = magnet_queue.restore(await job_queue.held())
+
+    async def resume(user_id, account):
+        session = await get_session(user_id)
+        seedr = session.accounts.accounts.get(account) if session else None
+        if seedr is not None:
+            # Space may have freed up while the bot was down
+            await _drain_queue(bot, account, seedr)
+
+    results = await asyncio.gather(*(resume(user_id, account) for user_id, account in owners), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Resuming held magnets failed: {str(result)}")
+    return sum(len(magnet_queue.pending(account)) for _, account in owners)
+
+def _status_payload(message):
+    """Enough of a reply for a job to keep editing it, even after a restart"""
+    return {"chat_id": message.chat_id, "chat_type": message.chat.type, "message_id": message.message_id}
+
+def _job_status(bot, job):
+    """The reply a job reports to, rebuilt from its payload"""
+    payload = job.payload
+    message = Message(payload["message_id"], datetime.now(timezone.utc), Chat(payload["chat_id"], payload["chat_type"]))
+    message.set_bot(bot)
+    return message
+
+async def _job_account(job):
+    """The Seedr client a job runs against; gone if the account was detached meanwhile"""
+    session = await get_session(job.user_id)
+    seedr = session.accounts.accounts.get(job.account) if session else None
+    if seedr is None:
+        raise JobFailed(f"Seedr account {job.account} is no longer attached")
+    return seedr
+
+async def _job_node(seedr, item_id):
+    node = await seedr.index.lookup(item_id)
+    if not node or not node.link:
+        raise JobFailed("File not found or no download link available")
+    return node
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Welcome message and instructions"""
     welcome_text = """
@@ -13,13 +183,20 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 **Get Started:**
 1. `/authorize username password` - Login to your Seedr account
-2. Send me any magnet link to start downloading
+2. Send me any magnet link to start downloading (or many, one per line, or a .torrent/.txt file)
 3. Use `/list` to see your files
+4. `/authorize` more accounts to use them together: new torrents go to the one with the most room
+
 
 **Commands:**
 • `/list` - Show your files and folders
+• `/search <words>` - Find files and folders anywhere in your account
 • `/getlink <file_id>` - Get download link
-• `/delete <file_id>` - Delete a file
+• `/send <file_id>` - Send the file here (large files arrive in parts)
+• `/delete <file_id>` - Delete a file (several ids, ranges like `100-120` and patterns like `*.mkv` work too)
+• `/queue` - Torrents waiting for free space (`/queue top 3`, `/queue drop 3`, `/queue clear`)
+• `/accounts` - Attached Seedr accounts (`/accounts remove <username>`)
+• `/jobs` - Adds, deletes and sends in progress (they carry on after a restart)
 
 **Example:**
 `/authorize john.doe mypassword123`
@@ -31,6 +208,7 @@ Then send any magnet link like:
     """
     await update.message.reply_text(welcome_text.strip())
 
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
 async def authorize(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Authenticate with Seedr using username and password"""
     user_id = update.effective_user.id
@@ -57,25 +235,39 @@ Example: `/authorize myusername mypassword`
     
     try:
         seedr = SeedrAPI()
-        token = seedr.login_with_credentials(username, password)
+        try:
+            token = await seedr.login_with_credentials(username, password)
+        except Exception:
+            await seedr.close()
+            raise
+        
+        # Accounts attached earlier (possibly only in the store) stay attached
+        session = await get_session(user_id)
+        if session is None:
+            session = user_sessions.setdefault(user_id, Session(AccountPool()))
+        session.chat_id = update.effective_chat.id  # Where transfer notices go
         
-        user_sessions[user_id] = {
-            "seedr": seedr,
-            "authorized": True,
-            "username": username  # Store for reference
-        }
+        # Release the connection pool of an earlier login to the same account
+        previous = session.accounts.attach(username, seedr)
+        if previous:
+            await previous.close()
+        _track_session(user_id, session)
+        await session_store.save(user_id, _session_record(session))
         
-        await login_msg.edit_text("✅ Login successful! You can now use the bot.")
+        count = len(session.accounts)
+        if count > 1:
+            await login_msg.edit_text(f"✅ Login successful! {count} Seedr accounts are now attached (see /accounts).")
+        else:
+            await login_msg.edit_text("✅ Login successful! You can now use the bot.")
         
         # Test the connection by getting account info
         try:
-            contents = seedr.list_contents()
-            file_count = len(contents.get("files", []))
-            folder_count = len(contents.get("folders", []))
+            contents = await seedr.list_contents()
             await update.message.reply_text(
                 f"📊 **Account Status:**\n"
-                f"Files: {file_count}\n"
-                f"Folders: {folder_count}\n\n"
+                f"Files: {len(contents.files)}\n"
+                f"Folders: {len(contents.folders)}\n"
+                f"Size: {_format_size(contents.total_size)}\n\n"
                 f"Ready to use! Send me a magnet link or use /list to see your files."
             )
         except:
@@ -118,87 +310,291 @@ python debug_seedr.py
         """
         await update.message.reply_text(help_text.strip())
 
+async def _existing_hashes(accounts):
+    """Infohashes of torrents already in any of the user's accounts"""
+    listings = await asyncio.gather(
+        *(seedr.list_contents() for _, seedr in accounts.items()),
+        return_exceptions=True
+    )
+    return {
+        torrent.hash
+        for contents in listings if not isinstance(contents, Exception)
+        for torrent in contents.torrents
+    }
+
+async def _submit_magnets(update: Update, session, magnets):
+    """Queue an add job per account the magnets are spread over, each with its own live summary"""
+    accounts = session.accounts
+    new, duplicates = dedupe_magnets(magnets, await _existing_hashes(accounts))
+    
+    if not new:
+        await update.message.reply_text(f"ℹ️ Already in your Seedr account ({len(duplicates)} duplicate(s) skipped)")
+        return
+    
+    # Placed on the account with room and the fewest transfers; held there if none has room
+    batches = await accounts.assign(magnet_queue, new)
+    for account, batch in batches.items():
+        where = f" to {account}" if len(batches) > 1 else ""
+        status_msg = await update.message.reply_text(f"🔄 Adding {len(batch)} torrent(s){where}...")
+        await job_queue.enqueue("add", update.effective_user.id, account, {
+            "title": f"Add {len(batch)} torrent(s){where}",
+            "magnets": batch,
+            "single": len(magnets) == 1,
+            "duplicates": len(duplicates),
+            # magnet -> ADDED, QUEUED or FAILED, so a re-run skips them
+            "outcomes": {},
+            "errors": [],
+            **_status_payload(status_msg)
+        })
+        # Duplicates are reported once
+        duplicates = []
+
+def _add_summary(payload, done):
+    outcomes = list(payload["outcomes"].values())
+    added, queued, errors = outcomes.count(ADDED), outcomes.count(QUEUED), payload["errors"]
+    
+    if done and payload["single"]:
+        if added:
+            return "✅ Torrent added successfully!"
+        if queued:
+            return (
+                "⏸ Not enough free space in your Seedr account. "
+                "The torrent is queued and will be added when space frees up (see /queue)."
+            )
+        return f"❌ Failed to add torrent: {errors[0]}"
+    
+    lines = [f"{'✅' if done else '🔄'} Torrents added: {added}/{len(payload['magnets'])}"]
+    if errors:
+        lines.append(f"❌ Failed: {len(errors)}")
+        lines.extend(f"  • {error}" for error in errors[:10])
+    if queued:
+        lines.append(f"⏸ Waiting for free space: {queued} (see /queue)")
+    if payload["duplicates"]:
+        lines.append(f"ℹ️ Duplicates skipped: {payload['duplicates']}")
+    return "\n".join(lines)
+
+async def _run_add_job(bot, job):
+    """Submit the job's magnets with bounded concurrency; failed ones are retried with the job"""
+    seedr = await _job_account(job)
+    status_msg = _job_status(bot, job)
+    payload = job.payload
+    outcomes = payload["outcomes"]
+    pending = [magnet for magnet in payload["magnets"] if magnet not in outcomes]
+    
+    if job.attempts > 1 and pending:
+        # An interrupted attempt may have added some without recording it
+        seedr.folder_cache.invalidate(None)
+        existing = {torrent.hash for torrent in (await seedr.list_contents()).torrents}
+        pending, present = dedupe_magnets(pending, existing)
+        outcomes.update(dict.fromkeys(present, ADDED))
+    
+    # Seedr refusing a magnet is final; failed calls are retried with the job
+    failed_calls = []
+    last_edit = time.monotonic()
+    slots = asyncio.Semaphore(MAGNET_CONCURRENCY)
+    
+    async def submit(magnet):
+        nonlocal last_edit
+        async with slots:
+            outcome, detail = await magnet_queue.add(job.account, seedr, magnet, job.user_id, payload["chat_id"])
+            if outcome == FAILED and isinstance(detail, Exception):
+                failed_calls.append(str(detail))
+            else:
+                outcomes[magnet] = outcome
+                if outcome == FAILED:
+                    payload["errors"].append(detail)
+        # Throttle progress edits to stay clear of Telegram flood limits
+        if time.monotonic() - last_edit >= 1.0:
+            last_edit = time.monotonic()
+            try:
+                await edit_in_background(status_msg, _add_summary(payload, False))
+            except Exception:
+                pass
+    
+    try:
+        await asyncio.gather(*(submit(magnet) for magnet in pending))
+    finally:
+        await job_queue.checkpoint(job)
+    if ADDED in outcomes.values():
+        transfer_poller.wake(job.account)
+    
+    if failed_calls:
+        raise Exception(f"{len(failed_calls)} torrent(s) failed: {failed_calls[0]}")
+    await status_msg.edit_text(_add_summary(payload, True))
+
+async def _add_job_failed(bot, job, error):
+    job.payload["errors"].append(error)
+    await _job_status(bot, job).edit_text(_add_summary(job.payload, True))
+
+job_queue.register("add", _run_add_job, _add_job_failed)
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
 async def add_magnet(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Add magnet link to Seedr"""
+    """Add every magnet link in the message to Seedr"""
     user_id = update.effective_user.id
-    session = user_sessions.get(user_id)
+    session = await get_session(user_id)
     
-    if not session or not session.get("authorized"):
+    if not session or not session.authorized:
         await update.message.reply_text("❌ Please authorize first with /authorize")
         return
     
-    message_text = update.message.text.strip()
+    magnets = extract_magnets(update.message.text)
     
-    # Check if it's a magnet link
-    if not message_text.startswith("magnet:"):
+    if not magnets:
         await update.message.reply_text("❌ Please send a valid magnet link")
         return
     
     try:
-        seedr = session["seedr"]
-        result = seedr.add_torrent(message_text)
+        await _submit_magnets(update, session, magnets)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Error adding torrent: {str(e)}")
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def add_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Add torrents from an uploaded .torrent file or a .txt list of magnets"""
+    user_id = update.effective_user.id
+    session = await get_session(user_id)
+    
+    if not session or not session.authorized:
+        await update.message.reply_text("❌ Please authorize first with /authorize")
+        return
+    
+    document = update.message.document
+    try:
+        tg_file = await document.get_file()
+        data = bytes(await tg_file.download_as_bytearray())
         
-        if result.get("result"):
-            await update.message.reply_text("✅ Torrent added successfully!")
+        if document.file_name.lower().endswith(".torrent"):
+            magnets = [magnet_from_torrent(data)]
         else:
-            error_msg = result.get("error", "Unknown error")
-            await update.message.reply_text(f"❌ Failed to add torrent: {error_msg}")
-            
+            magnets = extract_magnets(data.decode("utf-8", "replace"))
+        
+        if not magnets:
+            await update.message.reply_text("❌ No magnet links found in this file")
+            return
+        
+        await _submit_magnets(update, session, magnets)
     except Exception as e:
         await update.message.reply_text(f"❌ Error adding torrent: {str(e)}")
 
+def _parent_folder(seedr, folder_id, contents):
+    """Folder id to go 'up' to from folder_id (None is the root)"""
+    node = seedr.index.nodes.get(folder_id)
+    if node:
+        return node.parent_id
+    return contents.parent
+
+def _clip(text, limit):
+    """text cut to at most limit characters, marked with an ellipsis when cut"""
+    text = str(text)
+    return text if len(text) <= limit else text[:max(0, limit - 1)] + "…"
+
+def _render_listing(seedr, folder_id, contents, page):
+    """Text and inline keyboard for one page of a folder listing"""
+    entries = contents.folders + contents.files
+    
+    pages = max(1, -(-len(entries) // LIST_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    page_entries = entries[page * LIST_PAGE_SIZE:(page + 1) * LIST_PAGE_SIZE]
+    
+    title = "📁 **Your Files:**" if folder_id is None else f"📂 **{_clip(contents.name or folder_id, 200)}:**"
+    message_parts = [f"{title} (page {page + 1}/{pages}, {_format_size(contents.total_size)})\n"]
+    buttons = []
+    
+    # Telegram rejects messages over 4096 characters: long names share what's left of 4000
+    budget = (4000 - len(message_parts[0])) // max(1, len(page_entries)) - 1
+    for item in page_entries:
+        if item.is_folder:
+            line = f"📂 `{item.id}` - "
+            message_parts.append(line + _clip(item.name, budget - len(line)))
+            buttons.append([InlineKeyboardButton(f"📂 {item.name[:40]}", callback_data=f"ls:{item.id}:0")])
+        else:
+            line, size = f"📄 `{item.id}` - ", f" ({round(item.size / 1024 / 1024, 2)} MB)"
+            message_parts.append(line + _clip(item.name, budget - len(line) - len(size)) + size)
+    
+    if not entries:
+        message_parts.append("This folder is empty")
+    
+    folder_key = folder_id or ""
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️ Prev", callback_data=f"ls:{folder_key}:{page - 1}"))
+    if folder_id is not None:
+        parent = _parent_folder(seedr, folder_id, contents)
+        nav.append(InlineKeyboardButton("⬆️ Up", callback_data=f"ls:{parent or ''}:0"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton("Next ▶️", callback_data=f"ls:{folder_key}:{page + 1}"))
+    if nav:
+        buttons.append(nav)
+    
+    return "\n".join(message_parts), InlineKeyboardMarkup(buttons)
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
 async def list_files(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """List files in Seedr account"""
+    """List files in Seedr account, one page at a time"""
     user_id = update.effective_user.id
-    session = user_sessions.get(user_id)
+    session = await get_session(user_id)
     
-    if not session or not session.get("authorized"):
+    if not session or not session.authorized:
         await update.message.reply_text("❌ Please authorize first with /authorize")
         return
     
     try:
-        seedr = session["seedr"]
-        contents = seedr.list_contents()
+        # Every attached account's root in one view
+        contents = await session.accounts.root_listing()
         
-        if not contents:
-            await update.message.reply_text("❌ Failed to fetch contents")
+        if contents.error and contents.empty:
+            await update.message.reply_text(f"❌ Failed to fetch contents: {contents.error}")
             return
         
-        files = contents.get("files", [])
-        folders = contents.get("folders", [])
-        
-        if not files and not folders:
+        if contents.empty:
             await update.message.reply_text("📁 Your Seedr account is empty")
             return
         
-        message_parts = ["📁 **Your Files:**\n"]
-        
-        # Add folders
-        for folder in folders:
-            message_parts.append(f"📂 `{folder['id']}` - {folder['name']}")
-        
-        # Add files
-        for file in files:
-            size_mb = round(file.get('size', 0) / 1024 / 1024, 2)
-            message_parts.append(f"📄 `{file['id']}` - {file['name']} ({size_mb} MB)")
-        
-        message = "\n".join(message_parts)
-        
-        # Split message if too long
-        if len(message) > 4000:
-            message = message[:4000] + "\n... (truncated)"
-        
-        await update.message.reply_text(message, parse_mode='Markdown')
+        message, keyboard = _render_listing(None, None, contents, 0)
+        await update.message.reply_text(message, parse_mode='Markdown', reply_markup=keyboard)
         
     except Exception as e:
         await update.message.reply_text(f"❌ Error listing files: {str(e)}")
 
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def browse_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /list navigation buttons by editing the listing in place"""
+    query = update.callback_query
+    session = await get_session(query.from_user.id)
+    
+    if not session or not session.authorized:
+        await query.answer("❌ Please authorize first with /authorize", show_alert=True)
+        return
+    
+    _, folder_key, page = query.data.split(":")
+    folder_id = folder_key or None
+    
+    try:
+        accounts = session.accounts
+        # Served from the folder cache; a folder is only fetched when it is opened
+        if folder_id is None:
+            seedr = None
+            contents = await accounts.root_listing()
+        else:
+            _, seedr = await accounts.owner_of(folder_id)
+            if seedr is None:
+                raise Exception("folder not found")
+            contents = await seedr.list_contents(folder_id)
+        message, keyboard = _render_listing(seedr, folder_id, contents, int(page))
+        await query.answer()
+        await query.edit_message_text(message, parse_mode='Markdown', reply_markup=keyboard)
+        
+    except Exception as e:
+        await query.answer(f"❌ Error listing files: {str(e)}"[:200], show_alert=True)
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
 async def get_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Get download link for a file"""
     user_id = update.effective_user.id
-    session = user_sessions.get(user_id)
+    session = await get_session(user_id)
     
-    if not session or not session.get("authorized"):
+    if not session or not session.authorized:
         await update.message.reply_text("❌ Please authorize first with /authorize")
         return
     
@@ -209,8 +605,8 @@ async def get_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
     file_id = context.args[0]
     
     try:
-        seedr = session["seedr"]
-        download_url = seedr.get_download_link(file_id)
+        _, seedr = await session.accounts.owner_of(file_id)
+        download_url = await seedr.get_download_link(file_id) if seedr else None
         
         if download_url:
             await update.message.reply_text(f"🔗 **Download Link:**\n{download_url}")
@@ -220,41 +616,508 @@ async def get_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await update.message.reply_text(f"❌ Error getting download link: {str(e)}")
 
-async def delete_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Delete a file or folder"""
+def _describe(node, account=None):
+    size_mb = round((node.size or 0) / 1024 / 1024, 2)
+    where = f" [{account}]" if account else ""
+    return f"{'📂' if node.is_folder else '📄'} {node.id} - {node.name} ({size_mb} MB){where}"
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Find files and folders by name anywhere in the account"""
     user_id = update.effective_user.id
-    session = user_sessions.get(user_id)
+    session = await get_session(user_id)
+    
+    if not session or not session.authorized:
+        await update.message.reply_text("❌ Please authorize first with /authorize")
+        return
+    
+    if not context.args:
+        await update.message.reply_text("❌ Usage: /search <words from the file name>")
+        return
+    
+    query = " ".join(context.args)
+    try:
+        # Answered from the account indexes; Seedr is only asked when one is empty or stale
+        accounts = session.accounts
+        matches = await accounts.search(query, SEARCH_RESULT_LIMIT)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Error searching: {str(e)}")
+        return
+    
+    if not matches:
+        await update.message.reply_text(f"🔍 Nothing matches \"{query}\"")
+        return
     
-    if not session or not session.get("authorized"):
+    lines = [f"🔍 Results for \"{query}\":"]
+    for account, node in matches:
+        entry = _describe(node, account if len(accounts) > 1 else None) + (f"\n🔗 {node.link}" if node.link else "")
+        if len("\n\n".join(lines + [entry])) > 4000:
+            break
+        lines.append(entry)
+    await update.message.reply_text("\n\n".join(lines))
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Inline mode: @bot <words> lists matching files with their links"""
+    query = update.inline_query
+    session = await get_session(query.from_user.id)
+    
+    if not session or not session.authorized:
+        await query.answer(
+            [], cache_time=0, is_personal=True,
+            button=InlineQueryResultsButton(text="Log in to Seedr first", start_parameter="authorize")
+        )
+        return
+    
+    if not query.query.strip():
+        await query.answer([], cache_time=0, is_personal=True)
+        return
+    
+    accounts = session.accounts
+    try:
+        matches = await accounts.search(query.query, SEARCH_RESULT_LIMIT)
+    except Exception:
+        matches = []
+    
+    results = [
+        InlineQueryResultArticle(
+            # Ids are only unique within one Seedr account
+            id=f"{node.id}:{account}"[:64],
+            title=node.name[:100],
+            description=_describe(node, account if len(accounts) > 1 else None),
+            url=node.link,
+            input_message_content=InputTextMessageContent(
+                f"{node.name}\n{node.link}" if node.link else f"{node.name} (id {node.id})"
+            )
+        )
+        for account, node in matches
+    ]
+    # Results are per account, so Telegram must not share them between users
+    await query.answer(results, cache_time=10, is_personal=True)
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def send_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send a file from Seedr straight into the chat"""
+    user_id = update.effective_user.id
+    session = await get_session(user_id)
+    
+    if not session or not session.authorized:
         await update.message.reply_text("❌ Please authorize first with /authorize")
         return
     
     if not context.args:
-        await update.message.reply_text("❌ Usage: /delete <file_id>")
+        await update.message.reply_text("❌ Usage: /send <file_id>")
         return
     
     file_id = context.args[0]
+    status_msg = await update.message.reply_text("🔄 Preparing file...")
     
     try:
-        seedr = session["seedr"]
-        result = seedr.delete_item(file_id)
-        
-        if result.get("result"):
-            await update.message.reply_text("✅ Item deleted successfully!")
+        account, seedr = await session.accounts.owner_of(file_id)
+        if seedr is None:
+            raise Exception("File not found or no download link available")
+        job_id, created = await job_queue.enqueue("send", user_id, account, {
+            "title": f"Send {file_id}",
+            "item_id": file_id,
+            "parts_sent": 0,
+            **_status_payload(status_msg)
+        }, dedupe_key=f"send:{update.effective_chat.id}:{account}:{file_id}")
+        if not created:
+            await status_msg.edit_text(f"ℹ️ Already being sent (job #{job_id}, see /jobs)")
+    except Exception as e:
+        await status_msg.edit_text(f"❌ Error sending file: {str(e)}")
+
+async def _run_send_job(bot, job):
+    seedr = await _job_account(job)
+    await _job_node(seedr, job.payload["item_id"])
+    
+    async def part_sent(part):
+        # Parts already in the chat are not sent again by a retry
+        job.payload["parts_sent"] = part
+        await job_queue.checkpoint(job)
+    
+    status_msg = _job_status(bot, job)
+    parts = await file_sender.send(
+        bot, job.payload["chat_id"], seedr, job.payload["item_id"], status_msg,
+        job.payload["parts_sent"], part_sent
+    )
+    await status_msg.edit_text(f"✅ File sent{f' in {parts} parts' if parts > 1 else ''}!")
+
+async def _send_job_failed(bot, job, error):
+    await _job_status(bot, job).edit_text(f"❌ Error sending file: {error}")
+
+job_queue.register("send", _run_send_job, _send_job_failed)
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def download_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin-only: mirror a file (or a folder as zip) into DOWNLOAD_DIR on the bot's host"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_IDS:
+        await update.message.reply_text("❌ This command is for bot admins only")
+        return
+    
+    session = await get_session(user_id)
+    if not session or not session.authorized:
+        await update.message.reply_text("❌ Please authorize first with /authorize")
+        return
+    
+    if not context.args:
+        await update.message.reply_text("❌ Usage: /download <file_id>")
+        return
+    
+    file_id = context.args[0]
+    status_msg = await update.message.reply_text("🔄 Preparing download...")
+    
+    try:
+        account, seedr = await session.accounts.owner_of(file_id)
+        if seedr is None:
+            raise Exception("File not found or no download link available")
+        job_id, created = await job_queue.enqueue("download", user_id, account, {
+            "title": f"Download {file_id}",
+            "item_id": file_id,
+            **_status_payload(status_msg)
+        }, dedupe_key=f"download:{account}:{file_id}")
+        if not created:
+            await status_msg.edit_text(f"ℹ️ Already being downloaded (job #{job_id}, see /jobs)")
+    except Exception as e:
+        await status_msg.edit_text(f"❌ Error downloading file: {str(e)}")
+
+async def _run_download_job(bot, job):
+    """The ranged downloader keeps a manifest, so a retry resumes the chunks it already has"""
+    seedr = await _job_account(job)
+    node = await _job_node(seedr, job.payload["item_id"])
+    status_msg = _job_status(bot, job)
+    last_edit = 0.0
+    
+    async def progress(done, total):
+        nonlocal last_edit
+        if time.monotonic() - last_edit < file_sender.progress_interval:
+            return
+        last_edit = time.monotonic()
+        try:
+            await edit_in_background(status_msg, f"⬇️ Downloading {node.name}: {done * 100 // total}%")
+        except Exception:
+            pass
+    
+    result = await seedr.download_file(job.payload["item_id"], DOWNLOAD_DIR, progress)
+    await status_msg.edit_text(
+        f"✅ Saved {result['path']} ({round(result['size'] / 1024 / 1024, 2)} MB, "
+        f"{round(result['bytes_per_sec'] / 1024 / 1024, 2)} MB/s)"
+    )
+
+async def _download_job_failed(bot, job, error):
+    await _job_status(bot, job).edit_text(f"❌ Error downloading file: {error}")
+
+job_queue.register("download", _run_download_job, _download_job_failed)
+
+def _resolve_delete_targets(index, args):
+    """Turn ids, id ranges (100-120) and name globs into a list of ids to delete"""
+    selected = {}
+    unknown_ids = []
+    unmatched = []
+    
+    for arg in args:
+        range_match = re.fullmatch(r"(\d+)-(\d+)", arg)
+        if arg.isdigit():
+            node = index.nodes.get(arg)
+            if node:
+                selected[arg] = node
+            else:
+                # Not in the tree (e.g. an active torrent) - let Seedr decide
+                unknown_ids.append(arg)
+        elif range_match:
+            low, high = sorted(int(n) for n in range_match.groups())
+            matches = {nid: n for nid, n in index.nodes.items() if nid.isdigit() and low <= int(nid) <= high}
+            selected.update(matches)
+            if not matches:
+                unmatched.append(arg)
         else:
-            error_msg = result.get("error", "Unknown error")
-            await update.message.reply_text(f"❌ Failed to delete item: {error_msg}")
+            pattern = arg.lower()
+            matches = {nid: n for nid, n in index.nodes.items() if fnmatch.fnmatchcase(n.name.lower(), pattern)}
+            selected.update(matches)
+            if not matches:
+                unmatched.append(arg)
+    
+    # Deleting a folder already removes everything below it
+    def has_selected_ancestor(node):
+        parent = node.parent_id
+        while parent is not None:
+            if parent in selected:
+                return True
+            parent_node = index.nodes.get(parent)
+            parent = parent_node.parent_id if parent_node else None
+        return False
+    
+    targets = {nid: n for nid, n in selected.items() if not has_selected_ancestor(n)}
+    return targets, unknown_ids, unmatched
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def delete_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Delete files or folders by id, id range or name pattern"""
+    user_id = update.effective_user.id
+    session = await get_session(user_id)
+    
+    if not session or not session.authorized:
+        await update.message.reply_text("❌ Please authorize first with /authorize")
+        return
+    
+    if not context.args:
+        await update.message.reply_text(
+            "❌ Usage: /delete <file_id> [more ids...]\n"
+            "Also accepts id ranges (100-120) and name patterns (*.mkv)"
+        )
+        return
+    
+    try:
+        accounts = session.accounts.items()
+        await asyncio.gather(*(seedr.index.ensure_fresh() for _, seedr in accounts))
+        
+        # Resolve the arguments against every account; ids exist in only one of them
+        plans = []
+        unknown_ids, unmatched = None, None
+        for account, seedr in accounts:
+            targets, unknown_here, unmatched_here = _resolve_delete_targets(seedr.index, context.args)
+            plans.append((account, seedr, targets, list(targets)))
+            unknown_ids = unknown_here if unknown_ids is None else [i for i in unknown_ids if i in unknown_here]
+            unmatched = unmatched_here if unmatched is None else [a for a in unmatched if a in unmatched_here]
+        
+        # Not in any tree (e.g. an active torrent): the account listing it, else the first one decides
+        for item_id in unknown_ids:
+            owner, _ = await session.accounts.owner_of(item_id)
+            for account, _, _, item_ids in plans:
+                if account == (owner or plans[0][0]):
+                    item_ids.append(item_id)
+        
+        plans = [plan for plan in plans if plan[3]]
+        total = sum(len(item_ids) for _, _, _, item_ids in plans)
+        if not total:
+            await update.message.reply_text("❌ Nothing matched: " + ", ".join(unmatched))
+            return
+        
+        for account, _, targets, item_ids in plans:
+            where = f" from {account}" if len(plans) > 1 else ""
+            status_msg = await update.message.reply_text(f"🔄 Deleting {len(item_ids)} item(s){where}...")
+            await job_queue.enqueue("delete", user_id, account, {
+                "title": f"Delete {len(item_ids)} item(s){where}",
+                "ids": item_ids,
+                "sizes": {item_id: node.size or 0 for item_id, node in targets.items()},
+                "single": total == 1 and not unmatched,
+                "unmatched": unmatched,
+                "deleted": [],
+                "freed": 0,
+                "errors": [],
+                **_status_payload(status_msg)
+            })
+            # Unmatched arguments are reported once
+            unmatched = []
             
     except Exception as e:
         await update.message.reply_text(f"❌ Error deleting item: {str(e)}")
 
+def _delete_summary(payload):
+    deleted, total, errors = len(payload["deleted"]), len(payload["ids"]), payload["errors"]
+    if payload["single"]:
+        return "✅ Item deleted successfully!" if deleted else f"❌ Failed to delete item: {errors[0]}"
+    lines = [f"✅ Deleted {deleted}/{total} item(s), freed {round(payload['freed'] / 1024 / 1024, 2)} MB"]
+    if errors:
+        lines.append("❌ Failed: " + "; ".join(errors[:5]))
+    if payload["unmatched"]:
+        lines.append("ℹ️ Nothing matched: " + ", ".join(payload["unmatched"]))
+    return "\n".join(lines)
+
+async def _run_delete_job(bot, job):
+    """Delete in batches; ids already gone (by an earlier attempt) count as deleted"""
+    seedr = await _job_account(job)
+    payload = job.payload
+    sizes = payload["sizes"]
+    remaining = [item_id for item_id in payload["ids"] if item_id not in payload["deleted"]]
+    freed = 0
+    
+    if job.attempts > 1 and remaining:
+        seedr.index.invalidate()
+        await seedr.index.ensure_fresh()
+        gone = [item_id for item_id in remaining if item_id in sizes and item_id not in seedr.index.nodes]
+        payload["deleted"].extend(gone)
+        remaining = [item_id for item_id in remaining if item_id not in gone]
+    
+    # A failed call is retried with the job; Seedr refusing an item is final
+    try:
+        results = await seedr.delete_items(remaining, DELETE_BATCH_SIZE) if remaining else []
+        for chunk, result in results:
+            if result.get("result"):
+                payload["deleted"].extend(chunk)
+                freed += sum(sizes.get(item_id, 0) for item_id in chunk)
+            else:
+                payload["errors"].append(result.get("error", "Unknown error"))
+    finally:
+        payload["freed"] += freed
+        await job_queue.checkpoint(job)
+    
+    # Freed space lets queued magnets in
+    if payload["deleted"]:
+        magnet_queue.space_freed(job.account, freed)
+        await _drain_queue(bot, job.account, seedr)
+    
+    await _job_status(bot, job).edit_text(_delete_summary(payload))
+
+async def _delete_job_failed(bot, job, error):
+    job.payload["errors"].append(error)
+    await _job_status(bot, job).edit_text(_delete_summary(job.payload))
+
+job_queue.register("delete", _run_delete_job, _delete_job_failed)
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def show_queue(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """List, reorder or drop magnets waiting for free space"""
+    user_id = update.effective_user.id
+    session = await get_session(user_id)
+    
+    if not session or not session.authorized:
+        await update.message.reply_text("❌ Please authorize first with /authorize")
+        return
+    
+    accounts = session.accounts
+    args = context.args or []
+    # One numbering across accounts, each account's queue in its own order
+    pending = [(account, item) for account, _ in accounts.items() for item in magnet_queue.pending(account)]
+    
+    if args and args[0] == "clear":
+        dropped = 0
+        for account, _ in accounts.items():
+            dropped += len(await magnet_queue.drop(account))
+        await update.message.reply_text(f"🗑 Dropped {dropped} queued torrent(s)")
+        return
+    
+    if args and args[0] in ("top", "drop"):
+        if len(args) < 2 or not args[1].isdigit():
+            await update.message.reply_text(f"❌ Usage: /queue {args[0]} <position>")
+            return
+        position = int(args[1])
+        if 1 <= position <= len(pending):
+            account, item = pending[position - 1]
+            if args[0] == "top":
+                await magnet_queue.promote(account, item)
+                await update.message.reply_text(f"⬆️ Moved to the front: {item.name}")
+            else:
+                await magnet_queue.drop(account, item)
+                await update.message.reply_text(f"🗑 Dropped: {item.name}")
+            return
+        await update.message.reply_text(f"❌ No queued torrent at position {position}")
+        return
+    
+    if not pending:
+        await update.message.reply_text("⏸ No torrents are waiting for space")
+        return
+    
+    free = [magnet_queue.free_space(account) for account, _ in accounts.items()]
+    known = [f for f in free if f is not None]
+    lines = [f"⏸ Waiting for free space ({_format_size(max(sum(known), 0)) if known else 'unknown'} free):"]
+    for position, (account, item) in enumerate(pending[:30], 1):
+        where = f" [{account}]" if len(accounts) > 1 else ""
+        lines.append(f"{position}. {item.name} ({_format_size(item.size)}){where}")
+    if len(pending) > 30:
+        lines.append(f"... and {len(pending) - 30} more")
+    await update.message.reply_text("\n".join(lines))
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def list_accounts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show attached Seedr accounts, or detach one with /accounts remove <username>"""
+    user_id = update.effective_user.id
+    session = await get_session(user_id)
+    
+    if not session or not session.authorized:
+        await update.message.reply_text("❌ Please authorize first with /authorize")
+        return
+    
+    accounts = session.accounts
+    args = context.args or []
+    
+    if args and args[0] == "remove":
+        if len(args) < 2:
+            await update.message.reply_text("❌ Usage: /accounts remove <username>")
+            return
+        seedr = accounts.detach(args[1])
+        if seedr is None:
+            await update.message.reply_text(f"❌ No attached account named {args[1]}")
+            return
+        await seedr.close()
+        if len(accounts):
+            await session_store.save(user_id, _session_record(session))
+        else:
+            user_sessions.pop(user_id, None)
+            await session_store.delete(user_id)
+        await update.message.reply_text(f"✅ Detached {args[1]}")
+        return
+    
+    # Space and transfers of every account, read concurrently
+    await accounts.refresh(magnet_queue)
+    lines = [f"👥 {len(accounts)} Seedr account(s):"]
+    for account, seedr in accounts.items():
+        free = magnet_queue.free_space(account)
+        free_text = _format_size(max(free, 0)) if free is not None else "unknown"
+        lines.append(f"• {account}: {free_text} free, {active_transfers(seedr)} active transfer(s)")
+    await update.message.reply_text("\n".join(lines))
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def show_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Recent background jobs of this user and where they stand"""
+    user_id = update.effective_user.id
+    counts, jobs = await asyncio.gather(job_queue.store.counts(user_id), job_queue.store.user_jobs(user_id, 15))
+    
+    if not jobs:
+        await update.message.reply_text("📋 No jobs yet")
+        return
+    
+    lines = ["📋 Jobs: " + ", ".join(f"{counts.get(state, 0)} {state}" for state in JOB_STATE_ICONS)]
+    for job in jobs:
+        line = f"{JOB_STATE_ICONS.get(job.state, '•')} #{job.id} {job.payload.get('title', job.kind)} - {job.state}"
+        if job.attempts > 1 and job.state in ("queued", "running"):
+            line += f" (attempt {job.attempts}/{job_queue.max_attempts})"
+        if job.error and job.state in ("queued", "failed"):
+            line += f": {job.error[:100]}"
+        lines.append(line)
+    
+    if user_id in ADMIN_IDS:
+        everyone = await job_queue.store.counts()
+        lines.append("\n👥 All users: " + ", ".join(f"{everyone.get(state, 0)} {state}" for state in JOB_STATE_ICONS))
+        lines.append(f"⚙️ Running in this process: {job_queue.running}/{job_queue.workers}")
+    await update.message.reply_text("\n".join(lines))
+
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Admin-only runtime statistics"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("❌ This command is for bot admins only")
+        return
+    
+    lines = ["📈 **Seedr calls:**"]
+    lines += metrics.summary("seedr") or ["• none yet"]
+    lines.append("\n🤖 **Handlers:**")
+    lines += metrics.summary("handler") or ["• none yet"]
+    
+    codes = ", ".join(
+        f"{call} {code}: {count}" for (_, call, code), count in sorted(metrics.status_codes.items(), key=str)
+    )
+    lines.append(f"\n🌐 **Seedr HTTP status codes:** {codes or 'none yet'}")
+    
+    if context.bot.rate_limiter:
+        outbox = context.bot.rate_limiter.stats()
+        lines.append("\n📤 **Outbox:** " + ", ".join(f"{k}={v}" for k, v in outbox.items()))
+    
+    lines.append("\n🗂 **Folder cache:** " + ", ".join(f"{k}={v}" for k, v in folder_cache_totals.stats().items()))
+    lines.append("🔗 **Shared reads:** " + ", ".join(f"{k}={v}" for k, v in flight_totals.stats().items()))
+    
+    lines.append(f"\n👥 Active sessions: {len(user_sessions)} ({user_sessions.evictions} evicted so far)")
+    await update.message.reply_text("\n".join(lines))
+
 # Handle non-command text messages
+@instrument("handler", "handler", TRACE_SAMPLE_RATE)
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text messages that aren't commands"""
     message_text = update.message.text.strip()
     
-    # Check if it's a magnet link
-    if message_text.startswith("magnet:"):
+    # Check if it contains magnet links (one or many, one per line)
+    if "magnet:" in message_text.lower():
         await add_magnet(update, context)
     else:
         await update.message.reply_text("ℹ️ Send a magnet link to add a torrent, or use /help for commands")
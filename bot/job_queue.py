@@ -0,0 +1,424 @@
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Longest wait between attempts of a failing job
+MAX_RETRY_DELAY = 300
+
+
+class JobFailed(Exception):
+    """Raised by a runner when retrying can't help (file gone, account detached)"""
+
+
+class Job:
+    """One row of the jobs table"""
+
+    __slots__ = ("id", "kind", "user_id", "account", "payload", "state", "attempts", "error", "created_at")
+
+    def __init__(self, row):
+        self.id, self.kind, self.user_id, self.account, payload, self.state, \
+            self.attempts, self.error, self.created_at = row
+        self.payload = json.loads(payload)
+
+
+JOB_COLUMNS = "id, kind, user_id, account, payload, state, attempts, error, created_at"
+
+
+class JobStore:
+    """SQLite table of jobs in WAL mode; several processes can share one file.
+
+    A running job holds a lease that its worker keeps renewing. When a process
+    dies its leases run out and the jobs become claimable again, so a restart
+    picks up where the last one stopped.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "kind TEXT NOT NULL, "
+            "user_id INTEGER NOT NULL, "
+            "account TEXT, "
+            "shard INTEGER, "
+            "dedupe_key TEXT, "
+            "payload TEXT NOT NULL, "
+            "state TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "not_before REAL NOT NULL, "
+            "lease_until REAL, "
+            "error TEXT, "
+            "created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        # Magnets waiting for free space (see MagnetQueue), so a restart doesn't lose them
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS held ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "user_id INTEGER NOT NULL, "
+            "account TEXT NOT NULL, "
+            "shard INTEGER, "
+            "chat_id INTEGER, "
+            "magnet TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, "
+            "queued_at REAL NOT NULL)"
+        )
+        if "shard" not in {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+            # Files from before jobs were tied to a worker
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN shard INTEGER")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, not_before)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_account ON jobs (account, state)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_id, id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, state)")
+
+    def _transaction(self, work):
+        # IMMEDIATE takes the write lock up front, so two processes never claim the same job
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _enqueue(self, kind, user_id, account, shard, payload, dedupe_key):
+        def work():
+            if dedupe_key is not None:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND state IN (?, ?)",
+                    (dedupe_key, QUEUED, RUNNING)
+                ).fetchone()
+                if row:
+                    return row[0], False
+            now = time.time()
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (kind, user_id, account, shard, dedupe_key, payload, state, not_before, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, user_id, account, shard, dedupe_key, json.dumps(payload), QUEUED, now, now, now)
+            )
+            return cursor.lastrowid, True
+        return self._transaction(work)
+
+    def _claim(self, lease, account_limit, shard):
+        """Lease the oldest ready job of this shard (None: any) whose account is below its limit; counts as an attempt"""
+        def work():
+            now = time.time()
+            row = self._conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs AS j "
+                "WHERE ((state = ? AND not_before <= ?) OR (state = ? AND lease_until < ?)) "
+                "AND (? IS NULL OR shard = ?) "
+                "AND (account IS NULL OR (SELECT COUNT(*) FROM jobs AS r WHERE r.account = j.account "
+                "AND r.state = ? AND r.lease_until >= ?) < ?) "
+                "ORDER BY not_before, id LIMIT 1",
+                (QUEUED, now, RUNNING, now, shard, shard, RUNNING, now, account_limit)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_until = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, now + lease, now, row[0])
+            )
+            job = Job(row)
+            job.state = RUNNING
+            job.attempts += 1
+            return job
+        return self._transaction(work)
+
+    def _reshard(self, shard_of):
+        """Give unfinished jobs to the workers that own their users now (the worker count may have changed)"""
+        def work():
+            rows = self._conn.execute(
+                "SELECT DISTINCT user_id, shard FROM jobs WHERE state IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+            for user_id, shard in rows:
+                owner = shard_of(user_id)
+                if owner != shard:
+                    self._conn.execute(
+                        "UPDATE jobs SET shard = ? WHERE user_id = ? AND state IN (?, ?)",
+                        (owner, user_id, QUEUED, RUNNING)
+                    )
+            for user_id, shard in self._conn.execute("SELECT DISTINCT user_id, shard FROM held").fetchall():
+                owner = shard_of(user_id)
+                if owner != shard:
+                    self._conn.execute("UPDATE held SET shard = ? WHERE user_id = ?", (owner, user_id))
+        self._transaction(work)
+
+    def _hold(self, user_id, account, shard, chat_id, magnet, priority, queued_at):
+        with self._lock:
+            return self._conn.execute(
+                "INSERT INTO held (user_id, account, shard, chat_id, magnet, priority, queued_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, account, shard, chat_id, magnet, priority, queued_at)
+            ).lastrowid
+
+    def _unhold(self, keys):
+        with self._lock:
+            self._conn.executemany("DELETE FROM held WHERE id = ?", [(key,) for key in keys])
+
+    def _held(self, shard):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, user_id, account, chat_id, magnet, priority, queued_at FROM held "
+                "WHERE ? IS NULL OR shard = ? ORDER BY priority, id",
+                (shard, shard)
+            ).fetchall()
+
+    def _update(self, sql, params):
+        with self._lock:
+            self._conn.execute(sql, params)
+
+    def _renew(self, job_id, lease):
+        self._update("UPDATE jobs SET lease_until = ? WHERE id = ? AND state = ?", (time.time() + lease, job_id, RUNNING))
+
+    def _checkpoint(self, job_id, payload):
+        self._update("UPDATE jobs SET payload = ?, updated_at = ? WHERE id = ?", (json.dumps(payload), time.time(), job_id))
+
+    def _finish(self, job_id, state, error, payload):
+        self._update(
+            "UPDATE jobs SET state = ?, error = ?, payload = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+            (state, error, json.dumps(payload), time.time(), job_id)
+        )
+
+    def _retry(self, job_id, delay, error, payload):
+        now = time.time()
+        self._update(
+            "UPDATE jobs SET state = ?, not_before = ?, error = ?, payload = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+            (QUEUED, now + delay, error, json.dumps(payload), now, job_id)
+        )
+
+    def _release(self, job_id, payload):
+        # Interrupted by shutdown, not by a failure: the attempt doesn't count
+        self._update(
+            "UPDATE jobs SET state = ?, attempts = attempts - 1, payload = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+            (QUEUED, json.dumps(payload), time.time(), job_id)
+        )
+
+    def _user_jobs(self, user_id, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE user_id = ? ORDER BY id DESC LIMIT ?", (user_id, limit)
+            ).fetchall()
+        return [Job(row) for row in rows]
+
+    def _counts(self, user_id):
+        with self._lock:
+            if user_id is None:
+                rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT state, COUNT(*) FROM jobs WHERE user_id = ? GROUP BY state", (user_id,)
+                ).fetchall()
+        return dict(rows)
+
+    def _purge(self, before):
+        self._update("DELETE FROM jobs WHERE state IN (?, ?) AND updated_at < ?", (DONE, FAILED, before))
+
+    # sqlite3 is blocking, so keep it off the event loop
+    async def enqueue(self, kind, user_id, account, payload, dedupe_key=None, shard=None):
+        return await asyncio.to_thread(self._enqueue, kind, user_id, account, shard, payload, dedupe_key)
+
+    async def claim(self, lease, account_limit, shard=None):
+        return await asyncio.to_thread(self._claim, lease, account_limit, shard)
+
+    async def reshard(self, shard_of):
+        await asyncio.to_thread(self._reshard, shard_of)
+
+    async def hold(self, user_id, account, shard, chat_id, magnet, priority, queued_at):
+        return await asyncio.to_thread(self._hold, user_id, account, shard, chat_id, magnet, priority, queued_at)
+
+    async def unhold(self, keys):
+        await asyncio.to_thread(self._unhold, keys)
+
+    async def reprioritize(self, key, priority):
+        await asyncio.to_thread(self._update, "UPDATE held SET priority = ? WHERE id = ?", (priority, key))
+
+    async def held(self, shard=None):
+        return await asyncio.to_thread(self._held, shard)
+
+    async def renew(self, job_id, lease):
+        await asyncio.to_thread(self._renew, job_id, lease)
+
+    async def checkpoint(self, job_id, payload):
+        await asyncio.to_thread(self._checkpoint, job_id, payload)
+
+    async def finish(self, job_id, state, error, payload):
+        await asyncio.to_thread(self._finish, job_id, state, error, payload)
+
+    async def retry(self, job_id, delay, error, payload):
+        await asyncio.to_thread(self._retry, job_id, delay, error, payload)
+
+    async def release(self, job_id, payload):
+        await asyncio.to_thread(self._release, job_id, payload)
+
+    async def user_jobs(self, user_id, limit):
+        return await asyncio.to_thread(self._user_jobs, user_id, limit)
+
+    async def counts(self, user_id=None):
+        """Jobs per state, for one user or everyone"""
+        return await asyncio.to_thread(self._counts, user_id)
+
+    async def purge(self, before):
+        await asyncio.to_thread(self._purge, before)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """Pool of workers running jobs from the store, at most account_limit per Seedr account.
+
+    Runners are registered per kind and awaited as runner(bot, job). A runner
+    may run again after a crash or a failure, so it must skip whatever it
+    already did - job.payload is saved with checkpoint() as it goes. Raising
+    retries the job with backoff until max_attempts; raising JobFailed gives
+    up at once. Given-up jobs are handed to the kind's on_failed(bot, job, error).
+
+    With several worker processes sharing the store, start() is given this
+    worker's shard and shard_of(user_id): each job is tagged with its user's
+    shard and only that worker runs it, next to the user's session.
+    """
+
+    def __init__(self, store, workers, account_limit, max_attempts, retry_backoff,
+                 lease=60.0, poll_interval=1.0, retention=7 * 24 * 3600):
+        self.store = store
+        self.workers = workers
+        self.account_limit = account_limit
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.bot = None
+        self.shard = None
+        self.shard_of = None
+        self.running = 0
+        self._runners = {}
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+
+    def register(self, kind, runner, on_failed=None):
+        self._runners[kind] = (runner, on_failed)
+
+    async def start(self, bot, shard=None, shard_of=None):
+        self.bot = bot
+        self.shard = shard
+        self.shard_of = shard_of
+        await self.store.purge(time.time() - self.retention)
+        if shard_of is not None:
+            await self.store.reshard(shard_of)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, kind, user_id, account, payload, dedupe_key=None):
+        """Store a job; returns (job id, created) - an identical unfinished job is reused"""
+        shard = self.shard_of(user_id) if self.shard_of else None
+        job_id, created = await self.store.enqueue(kind, user_id, account, payload, dedupe_key, shard)
+        if created:
+            self._wakeup.set()
+        return job_id, created
+
+    # Held magnets, stored next to the jobs (MagnetQueue's store)
+    async def hold(self, user_id, account, chat_id, magnet, priority, queued_at):
+        shard = self.shard_of(user_id) if self.shard_of else None
+        return await self.store.hold(user_id, account, shard, chat_id, magnet, priority, queued_at)
+
+    async def unhold(self, keys):
+        await self.store.unhold(keys)
+
+    async def reprioritize(self, key, priority):
+        await self.store.reprioritize(key, priority)
+
+    async def held(self):
+        """Magnets this worker held before the last restart"""
+        return await self.store.held(self.shard)
+
+    async def checkpoint(self, job):
+        """Save job.payload so a re-run resumes from here"""
+        await self.store.checkpoint(job.id, job.payload)
+
+    async def wait_idle(self, interval=0.05):
+        """Return once nothing is queued or running (used by the benchmarks)"""
+        while True:
+            counts = await self.store.counts()
+            if not counts.get(QUEUED) and not counts.get(RUNNING):
+                return
+            await asyncio.sleep(interval)
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self.store.claim(self.lease, self.account_limit, self.shard)
+            except Exception as e:
+                print(f"Job claim failed: {str(e)}")
+                job = None
+            if job is None:
+                # Other processes and backed-off retries don't set the event, so look again regularly
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The store itself failed; the lease runs out and the job is claimed again
+                print(f"Job {job.id} bookkeeping failed: {str(e)}")
+
+    async def _keep_leased(self, job):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.store.renew(job.id, self.lease)
+            except Exception:
+                pass
+
+    async def _run(self, job):
+        runner, on_failed = self._runners.get(job.kind, (None, None))
+        renewer = asyncio.create_task(self._keep_leased(job))
+        self.running += 1
+        try:
+            if runner is None:
+                raise JobFailed(f"Unknown job kind: {job.kind}")
+            await runner(self.bot, job)
+        except asyncio.CancelledError:
+            await self.store.release(job.id, job.payload)
+            raise
+        except Exception as e:
+            if isinstance(e, JobFailed) or job.attempts >= self.max_attempts:
+                await self.store.finish(job.id, FAILED, str(e), job.payload)
+                if on_failed:
+                    try:
+                        await on_failed(self.bot, job, str(e))
+                    except Exception:
+                        pass
+            else:
+                # Jittered exponential backoff between attempts
+                delay = min(self.retry_backoff * 2 ** (job.attempts - 1), MAX_RETRY_DELAY)
+                await self.store.retry(job.id, delay * random.uniform(0.5, 1.0), str(e), job.payload)
+        else:
+            await self.store.finish(job.id, DONE, None, job.payload)
+        finally:
+            self.running -= 1
+            renewer.cancel()
@@ -0,0 +1,224 @@
+import asyncio
+import itertools
+import time
+
+from bot.magnets import magnet_name, magnet_size
+
+ADDED = "added"
+QUEUED = "queued"
+FAILED = "failed"
+
+
+class PendingMagnet:
+    """A magnet held back until the account has room for it"""
+
+    __slots__ = ("priority", "seq", "magnet", "name", "size", "user_id", "chat_id", "queued_at", "key")
+
+    def __init__(self, priority, seq, magnet, user_id, chat_id, queued_at=None):
+        self.priority = priority
+        self.seq = seq
+        self.magnet = magnet
+        self.name = magnet_name(magnet)
+        self.size = magnet_size(magnet)
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.queued_at = queued_at or time.time()
+        # Row id in the store, once saved
+        self.key = None
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AccountSpace:
+    """Free space of one account, kept current between /api/settings reads"""
+
+    def __init__(self):
+        self.space_max = None
+        self.space_used = 0
+        self.refreshed_at = 0.0
+        self.pending = []
+        self.draining = False
+        # One settings read at a time, so concurrent adds don't overwrite each other's reservations
+        self.refresh_lock = asyncio.Lock()
+
+    def free(self):
+        """Bytes believed free, or None before the first read"""
+        if self.space_max is None:
+            return None
+        return self.space_max - self.space_used
+
+    def fits(self, size):
+        free = self.free()
+        # Without a size or a quota reading there is nothing to check; Seedr decides
+        return size is None or free is None or size <= free
+
+
+def _is_space_error(result):
+    """Seedr answers a full account with result/error strings mentioning space"""
+    text = f"{result.get('result', '')} {result.get('error', '')}".lower()
+    return "space" in text
+
+
+class MagnetQueue:
+    """Per-account queue of magnets that don't fit yet, submitted as space frees up.
+
+    Space is read from get_account_info at most every refresh_interval seconds
+    and otherwise tracked incrementally: adds reserve the magnet's xl size and
+    deletes give back what they freed.
+
+    With a store (hold/unhold/reprioritize, as on JobQueue) held magnets are
+    saved as they change, and restore() puts them back after a restart.
+    """
+
+    def __init__(self, refresh_interval, store=None):
+        self.refresh_interval = refresh_interval
+        self.store = store
+        self._accounts = {}
+        self._seq = itertools.count()
+
+    def _space(self, account):
+        space = self._accounts.get(account)
+        if space is None:
+            space = self._accounts[account] = AccountSpace()
+        return space
+
+    async def _refresh(self, space, seedr, force=False):
+        if not force and time.monotonic() - space.refreshed_at < self.refresh_interval:
+            return
+        async with space.refresh_lock:
+            if not force and time.monotonic() - space.refreshed_at < self.refresh_interval:
+                return
+            try:
+                info = await seedr.get_account_info()
+                details = info.get("account", info)
+                space.space_max = int(details["space_max"])
+                space.space_used = int(details["space_used"])
+            except Exception:
+                # Keep the last known numbers; Seedr still rejects adds that don't fit
+                return
+            space.refreshed_at = time.monotonic()
+
+    async def refresh(self, account, seedr):
+        """Read the account's space if the last reading is stale"""
+        await self._refresh(self._space(account), seedr)
+
+    def pending(self, account):
+        """Held magnets in the order they will be tried"""
+        space = self._accounts.get(account)
+        return sorted(space.pending) if space else []
+
+    def free_space(self, account):
+        space = self._accounts.get(account)
+        return space.free() if space else None
+
+    async def _hold(self, space, account, magnet, user_id, chat_id):
+        item = PendingMagnet(0, next(self._seq), magnet, user_id, chat_id)
+        space.pending.append(item)
+        if self.store:
+            item.key = await self.store.hold(user_id, account, chat_id, magnet, item.priority, item.queued_at)
+        return item
+
+    async def _forget(self, items):
+        keys = [item.key for item in items if item.key is not None]
+        if self.store and keys:
+            await self.store.unhold(keys)
+
+    def restore(self, rows):
+        """Hold saved (key, user_id, account, chat_id, magnet, priority, queued_at) rows again, in their order;
+        returns the (user_id, account) pairs they belong to"""
+        owners = set()
+        for key, user_id, account, chat_id, magnet, priority, queued_at in rows:
+            item = PendingMagnet(priority, next(self._seq), magnet, user_id, chat_id, queued_at)
+            item.key = key
+            self._space(account).pending.append(item)
+            owners.add((user_id, account))
+        return owners
+
+    async def _submit(self, space, seedr, magnet):
+        """Reserve the magnet's size, add it, and give the space back if Seedr refuses"""
+        size = magnet_size(magnet) or 0
+        space.space_used += size
+        try:
+            result = await seedr.add_torrent(magnet)
+        except Exception as e:
+            space.space_used -= size
+            # The exception itself, so callers can tell a failed call from a refusal
+            return FAILED, e
+        if _is_space_error(result):
+            space.space_used -= size
+            # Our numbers were off; read them again before the next decision
+            space.refreshed_at = 0.0
+            return QUEUED, result
+        if not result.get("result"):
+            space.space_used -= size
+            return FAILED, result.get("error", "Unknown error")
+        return ADDED, result
+
+    async def add(self, account, seedr, magnet, user_id, chat_id):
+        """Add magnet now if it fits, otherwise hold it; returns (outcome, detail)"""
+        space = self._space(account)
+        await self._refresh(space, seedr)
+        if not space.fits(magnet_size(magnet)):
+            return QUEUED, await self._hold(space, account, magnet, user_id, chat_id)
+
+        outcome, detail = await self._submit(space, seedr, magnet)
+        if outcome == QUEUED:
+            detail = await self._hold(space, account, magnet, user_id, chat_id)
+        return outcome, detail
+
+    def space_freed(self, account, freed):
+        """Deleted items gave back `freed` bytes"""
+        space = self._accounts.get(account)
+        if space and freed:
+            space.space_used = max(0, space.space_used - freed)
+
+    async def drain(self, account, seedr):
+        """Submit held magnets that fit now, highest priority first; returns (item, outcome, detail)"""
+        space = self._accounts.get(account)
+        if not space or not space.pending or space.draining:
+            return []
+
+        space.draining = True
+        submitted = []
+        try:
+            # Deletes and finished transfers change usage in ways we can't predict exactly
+            await self._refresh(space, seedr, force=True)
+            for item in sorted(space.pending):
+                # A big magnet that doesn't fit yet doesn't block smaller ones behind it
+                if not space.fits(item.size):
+                    continue
+                space.pending.remove(item)
+                outcome, detail = await self._submit(space, seedr, item.magnet)
+                # Still no room, or Seedr didn't answer: keep it for the next drain
+                if outcome == QUEUED or (outcome == FAILED and isinstance(detail, Exception)):
+                    space.pending.append(item)
+                    break
+                await self._forget([item])
+                submitted.append((item, outcome, detail))
+        finally:
+            space.draining = False
+        return submitted
+
+    async def promote(self, account, item):
+        """Move a held magnet to the front of its account's queue"""
+        items = self.pending(account)
+        if items and item in items:
+            item.priority = items[0].priority - 1
+            if self.store and item.key is not None:
+                await self.store.reprioritize(item.key, item.priority)
+
+    async def drop(self, account, item=None):
+        """Forget one held magnet, or all of the account's; returns what was dropped"""
+        space = self._accounts.get(account)
+        if not space:
+            return []
+        if item is None:
+            dropped, space.pending = space.pending, []
+        elif item not in space.pending:
+            return []
+        else:
+            space.pending.remove(item)
+            dropped = [item]
+        await self._forget(dropped)
+        return dropped
@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import re
+from urllib.parse import parse_qs, quote
+
+MAGNET_RE = re.compile(r"magnet:\?[^\s<>\"']+", re.IGNORECASE)
+BTIH_RE = re.compile(r"urn:btih:([0-9a-z]+)", re.IGNORECASE)
+
+
+def extract_magnets(text):
+    """All magnet links in a message or text file, in order"""
+    return MAGNET_RE.findall(text)
+
+
+def magnet_infohash(magnet):
+    """Lower-case hex infohash from xt=urn:btih, or None"""
+    match = BTIH_RE.search(magnet)
+    if not match:
+        return None
+    value = match.group(1)
+    if len(value) == 32:
+        # Base32 form used by some clients
+        try:
+            return base64.b32decode(value.upper()).hex()
+        except ValueError:
+            return None
+    return value.lower() if len(value) == 40 else None
+
+
+def _magnet_params(magnet):
+    return parse_qs(magnet.partition("?")[2])
+
+
+def magnet_size(magnet):
+    """Total size in bytes from the xl parameter, or None if the magnet doesn't say"""
+    value = _magnet_params(magnet).get("xl", [""])[0]
+    return int(value) if value.isdigit() else None
+
+
+def magnet_name(magnet):
+    """Display name from the dn parameter, falling back to the infohash"""
+    name = _magnet_params(magnet).get("dn", [""])[0]
+    return name or magnet_infohash(magnet) or magnet[:60]
+
+
+def dedupe_magnets(magnets, known_hashes=()):
+    """Split magnets into (new, duplicates) by infohash"""
+    seen = set(known_hashes)
+    new, duplicates = [], []
+    for magnet in magnets:
+        infohash = magnet_infohash(magnet)
+        if infohash and infohash in seen:
+            duplicates.append(magnet)
+            continue
+        if infohash:
+            seen.add(infohash)
+        new.append(magnet)
+    return new, duplicates
+
+
+def _bdecode(data, pos=0):
+    """Decode one bencoded value at pos; returns (value, end position)"""
+    token = data[pos:pos + 1]
+    if token == b"i":
+        end = data.index(b"e", pos)
+        return int(data[pos + 1:end]), end + 1
+    if token == b"l":
+        items, pos = [], pos + 1
+        while data[pos:pos + 1] != b"e":
+            item, pos = _bdecode(data, pos)
+            items.append(item)
+        return items, pos + 1
+    if token == b"d":
+        items, pos = {}, pos + 1
+        while data[pos:pos + 1] != b"e":
+            key, pos = _bdecode(data, pos)
+            value_start = pos
+            value, pos = _bdecode(data, pos)
+            items[key] = value
+            # Remember where each raw value sits; the infohash is over the raw info dict
+            items.setdefault(b"__spans__", {})[key] = (value_start, pos)
+        return items, pos + 1
+    if token.isdigit():
+        colon = data.index(b":", pos)
+        length = int(data[pos:colon])
+        return data[colon + 1:colon + 1 + length], colon + 1 + length
+    raise ValueError(f"invalid bencode at offset {pos}")
+
+
+def magnet_from_torrent(data):
+    """Build a magnet link (with dn, xl and trackers) from .torrent file bytes"""
+    try:
+        meta, _ = _bdecode(bytes(data))
+        start, end = meta[b"__spans__"][b"info"]
+        info = meta[b"info"]
+        if not isinstance(info, dict):
+            raise ValueError("info is not a dictionary")
+        name = info.get(b"name", b"").decode("utf-8", "replace")
+        size = info.get(b"length") or sum(f.get(b"length", 0) for f in info.get(b"files", []))
+        trackers = [meta[b"announce"]] if b"announce" in meta else []
+        for tier in meta.get(b"announce-list", []):
+            trackers.extend(tier)
+        trackers = [tracker.decode("utf-8", "replace") for tracker in dict.fromkeys(trackers)]
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+        # Bencode that parses but isn't shaped like a torrent lands here too
+        raise Exception(f"Not a valid .torrent file: {str(e)}")
+
+    infohash = hashlib.sha1(data[start:end]).hexdigest()
+
+    magnet = f"magnet:?xt=urn:btih:{infohash}"
+    if name:
+        magnet += f"&dn={quote(name)}"
+    if size:
+        magnet += f"&xl={size}"
+    for tracker in trackers:
+        magnet += f"&tr={quote(tracker, safe='')}"
+    return magnet
@@ -0,0 +1,271 @@
+import asyncio
+import contextvars
+import functools
+import json
+import random
+import time
+from collections import deque
+
+# Latency buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, Prometheus style"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.total += seconds
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q):
+        """Upper bucket bound holding the q-th observation (good enough for dashboards)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bound in enumerate(BUCKETS):
+            seen += self.counts[i]
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self):
+        # (metric family, label name, label value) -> Histogram / count
+        self.latency = {}
+        self.errors = {}
+        self.calls = {}
+        # (kind, Seedr call, status code) -> count
+        self.status_codes = {}
+        # name -> callable returning a number, read at export time
+        self.gauges = {}
+        self.counters = {}
+
+    def observe(self, family, label, name, seconds, failed):
+        key = (family, label, name)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram()
+        histogram.observe(seconds)
+        self.calls[key] = self.calls.get(key, 0) + 1
+        if failed:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def observe_status(self, kind, status_code, call=None):
+        """Count one HTTP response (or "error"), labelled with the instrumented call that sent it"""
+        key = (kind, call or _current_call.get() or "other", status_code)
+        self.status_codes[key] = self.status_codes.get(key, 0) + 1
+
+    def register_gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def register_counter(self, name, fn):
+        """Like register_gauge, for values that only go up (exported as a counter)"""
+        self.counters[name] = fn
+
+    def render_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for family in sorted({key[0] for key in self.latency}):
+            lines.append(f"# TYPE {family}_duration_seconds histogram")
+            for (fam, label, name), histogram in sorted(self.latency.items()):
+                if fam != family:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{family}_duration_seconds_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{family}_duration_seconds_bucket{{{label}="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{family}_duration_seconds_sum{{{label}="{name}"}} {histogram.total:.6f}')
+                lines.append(f'{family}_duration_seconds_count{{{label}="{name}"}} {histogram.count}')
+            lines.append(f"# TYPE {family}_errors_total counter")
+            for (fam, label, name), histogram in sorted(self.latency.items()):
+                if fam == family:
+                    lines.append(f'{family}_errors_total{{{label}="{name}"}} {self.errors.get((fam, label, name), 0)}')
+
+        if self.status_codes:
+            lines.append("# TYPE seedr_http_responses_total counter")
+            for (kind, call, code), count in sorted(self.status_codes.items(), key=str):
+                lines.append(f'seedr_http_responses_total{{kind="{kind}",method="{call}",code="{code}"}} {count}')
+
+        series = [(name, fn, "gauge") for name, fn in self.gauges.items()]
+        series += [(name, fn, "counter") for name, fn in self.counters.items()]
+        for name, fn, metric_type in sorted(series):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, family, limit=15):
+        """Human-readable per-call summary for /stats"""
+        rows = [(key, h) for key, h in self.latency.items() if key[0] == family]
+        rows.sort(key=lambda row: row[1].total, reverse=True)
+        lines = []
+        for (_, label, name), histogram in rows[:limit]:
+            errors = self.errors.get((family, label, name), 0)
+            lines.append(
+                f"• {name}: {histogram.count} calls, "
+                f"avg {histogram.total / histogram.count * 1000:.0f} ms, "
+                f"p50≤{histogram.quantile(0.5) * 1000:.0f} ms, p99≤{histogram.quantile(0.99) * 1000:.0f} ms, "
+                f"{errors} errors"
+            )
+        return lines
+
+
+metrics = Metrics()
+
+
+# ========== Sampled traces ==========
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_span_depth = contextvars.ContextVar("span_depth", default=0)
+# Innermost instrumented function running, so HTTP status counts know which call sent them
+_current_call = contextvars.ContextVar("current_call", default=None)
+
+# Most recent finished traces, newest last
+recent_traces = deque(maxlen=20)
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def render(self):
+        total = time.perf_counter() - self.started
+        # Only top-level spans count against our own time; nested ones are inside them
+        outside = sum(duration for _, _, duration, depth in self.spans if depth == 0)
+        parts = [
+            f"{'  ' * depth}{name} {duration * 1000:.1f} ms"
+            for name, _, duration, depth in sorted(self.spans, key=lambda s: s[1])
+        ]
+        parts.append(f"own code {(total - outside) * 1000:.1f} ms")
+        return f"trace {self.name} {total * 1000:.1f} ms:\n" + "\n".join(parts)
+
+
+class span:
+    """Record a timed span in the current trace, if this request is being traced"""
+
+    def __init__(self, name):
+        self.name = name
+
+    async def __aenter__(self):
+        self.trace = _current_trace.get()
+        if self.trace is not None:
+            self.depth = _span_depth.get()
+            self.token = _span_depth.set(self.depth + 1)
+            self.started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.trace is not None:
+            _span_depth.reset(self.token)
+            self.trace.spans.append((self.name, self.started, time.perf_counter() - self.started, self.depth))
+        return False
+
+
+def instrument(family, label, sample_rate=0.0):
+    """Record latency and errors of an async function; handlers may also start sampled traces"""
+
+    def decorator(fn):
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            trace_token = None
+            if sample_rate and _current_trace.get() is None and random.random() < sample_rate:
+                trace_token = _current_trace.set(Trace(f"{family}.{name}"))
+
+            call_token = _current_call.set(name)
+            started = time.perf_counter()
+            failed = False
+            try:
+                if trace_token is not None:
+                    # The trace itself is the root; its spans are what happened inside
+                    return await fn(*args, **kwargs)
+                async with span(f"{family}.{name}"):
+                    return await fn(*args, **kwargs)
+            except BaseException as e:
+                failed = not isinstance(e, asyncio.CancelledError)
+                raise
+            finally:
+                _current_call.reset(call_token)
+                metrics.observe(family, label, name, time.perf_counter() - started, failed)
+                if trace_token is not None:
+                    trace = _current_trace.get()
+                    _current_trace.reset(trace_token)
+                    recent_traces.append(trace)
+                    print(f"🔍 {trace.render()}")
+
+        return wrapper
+
+    return decorator
+
+
+class Readiness:
+    """Startup state behind /readyz; /healthz only says the process is serving"""
+
+    def __init__(self):
+        self.ready = False
+        self.details = {}
+
+    def mark_ready(self, **details):
+        self.details.update(details)
+        self.ready = True
+
+    def render(self):
+        return json.dumps({"ready": self.ready, **self.details}) + "\n"
+
+
+readiness = Readiness()
+
+
+# ========== Prometheus and health endpoints ==========
+async def _serve_http(reader, writer):
+    try:
+        request_line = await reader.readline()
+        # Drain headers; nothing in them matters here
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        path = parts[1] if len(parts) > 1 else "/"
+
+        content_type = "text/plain; version=0.0.4"
+        if path == "/metrics":
+            status, body = "200 OK", metrics.render_prometheus()
+        elif path == "/healthz":
+            status, body = "200 OK", "ok\n"
+        elif path == "/readyz":
+            # 503 until startup has warmed the pool and restored sessions
+            status = "200 OK" if readiness.ready else "503 Service Unavailable"
+            body, content_type = readiness.render(), "application/json"
+        else:
+            status, body = "404 Not Found", "not found\n"
+
+        payload = body.encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host, port):
+    """Serve /metrics in Prometheus text format, plus /healthz and /readyz"""
+    return await asyncio.start_server(_serve_http, host, port)
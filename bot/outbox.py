@@ -0,0 +1,210 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from bot.metrics import span
+
+# Lower value is sent first
+USER = 0
+BACKGROUND = 1
+
+EDIT_ENDPOINTS = {"editMessageText", "editMessageReplyMarkup", "editMessageCaption"}
+
+
+class _Ticket:
+    __slots__ = ("priority", "seq", "chat_id", "enqueued", "granted", "result", "superseded_by")
+
+    def __init__(self, priority, seq, chat_id):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.enqueued = time.monotonic()
+        self.granted = asyncio.get_running_loop().create_future()
+        self.result = asyncio.get_running_loop().create_future()
+        # Only superseded edits read the result; don't warn when nobody does
+        self.result.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.superseded_by = None
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class OutboxRateLimiter(BaseRateLimiter):
+    """Schedules every outgoing Bot API call that targets a chat.
+
+    Enforces a global and a per-chat send rate, serves user-facing calls before
+    background ones (pass rate_limit_args={"priority": BACKGROUND}), collapses
+    queued edits of the same message into the latest one and re-queues calls
+    that Telegram answers with RetryAfter.
+    """
+
+    def __init__(self, global_rate, chat_interval, group_interval, max_retries=3):
+        self.global_interval = 1 / global_rate
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_retries = max_retries
+        self._queue = []
+        self._seq = itertools.count()
+        self._pending_edits = {}
+        self._next_global = 0.0
+        self._next_chat = {}
+        self._wakeup = None
+        self._dispatcher = None
+        # Metrics
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    async def initialize(self):
+        # ExtBot.initialize calls this again when the Updater initializes the bot
+        if self._dispatcher is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self):
+        return {
+            "queue_depth": sum(1 for t in self._queue if not t.granted.done()),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "avg_delay": round(self.total_delay / self.sent, 3) if self.sent else 0.0,
+            "max_delay": round(self.max_delay, 3)
+        }
+
+    def _interval_for(self, chat_id):
+        # Negative ids are groups and channels, which Telegram limits to ~20 messages/minute
+        if isinstance(chat_id, int) and chat_id > 0:
+            return self.chat_interval
+        return self.group_interval
+
+    def _enqueue(self, ticket):
+        heapq.heappush(self._queue, ticket)
+        self._wakeup.set()
+
+    async def _dispatch(self):
+        while True:
+            # Drop tickets that were superseded by a newer edit
+            while self._queue and self._queue[0].granted.done():
+                heapq.heappop(self._queue)
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            if now < self._next_global:
+                await asyncio.sleep(self._next_global - now)
+                continue
+
+            # Highest-priority ticket whose chat is allowed to receive now
+            ready = None
+            earliest = None
+            for ticket in sorted(self._queue):
+                if ticket.granted.done():
+                    continue
+                allowed_at = self._next_chat.get(ticket.chat_id, 0.0)
+                if allowed_at <= now:
+                    ready = ticket
+                    break
+                earliest = allowed_at if earliest is None else min(earliest, allowed_at)
+
+            if ready is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=earliest - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._queue.remove(ready)
+            heapq.heapify(self._queue)
+            self._next_global = now + self.global_interval
+            self._next_chat[ready.chat_id] = now + self._interval_for(ready.chat_id)
+
+            delay = now - ready.enqueued
+            self.total_delay += delay
+            self.max_delay = max(self.max_delay, delay)
+            ready.granted.set_result(True)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            # Not addressed to a chat (getMe, answerCallbackQuery, ...): no per-chat limit applies
+            return await callback(*args, **kwargs)
+
+        priority = (rate_limit_args or {}).get("priority", USER)
+        ticket = _Ticket(priority, next(self._seq), chat_id)
+
+        edit_key = None
+        if endpoint in EDIT_ENDPOINTS:
+            edit_key = (chat_id, data.get("message_id"))
+            older = self._pending_edits.get(edit_key)
+            if older is not None and not older.granted.done():
+                # The older edit is still queued: only the latest text needs to go out
+                older.superseded_by = ticket
+                older.granted.set_result(False)
+                self.coalesced += 1
+            self._pending_edits[edit_key] = ticket
+
+        self._enqueue(ticket)
+        try:
+            for attempt in range(self.max_retries + 1):
+                if not await ticket.granted:
+                    response = await asyncio.shield(ticket.superseded_by.result)
+                    ticket.result.set_result(response)
+                    return response
+                try:
+                    async with span(f"telegram.{endpoint}"):
+                        response = await callback(*args, **kwargs)
+                except RetryAfter as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retried += 1
+                    # Telegram told us when this chat may be written to again
+                    self._next_chat[chat_id] = time.monotonic() + e.retry_after
+                    ticket.granted = asyncio.get_running_loop().create_future()
+                    ticket.enqueued = time.monotonic()
+                    self._enqueue(ticket)
+                    continue
+                self.sent += 1
+                ticket.result.set_result(response)
+                return response
+        except BaseException as e:
+            # Hand the outcome to any older edits that were folded into this one
+            if not ticket.result.done():
+                if isinstance(e, asyncio.CancelledError):
+                    # Release the queue slot if it was never granted
+                    if not ticket.granted.done():
+                        ticket.granted.cancel()
+                    ticket.result.cancel()
+                else:
+                    ticket.result.set_exception(e)
+            raise
+        finally:
+            if edit_key is not None and self._pending_edits.get(edit_key) is ticket:
+                del self._pending_edits[edit_key]
+
+
+async def edit_in_background(message, text):
+    """Progress-style edit that yields to user-facing sends"""
+    return await message.get_bot().edit_message_text(
+        text,
+        chat_id=message.chat_id,
+        message_id=message.message_id,
+        rate_limit_args={"priority": BACKGROUND}
+    )
@@ -0,0 +1,109 @@
+import heapq
+import re
+from collections import defaultdict
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """Lower-case words of a file name or query ("Show.S01E02_1080p" -> show, s01e02, 1080p)"""
+    return WORD_RE.findall(text.lower())
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Trigram and word index over node names, kept in step with the account index.
+
+    Terms of three or more characters match anywhere in a name (trigram
+    postings narrow the candidates, then a substring check confirms them);
+    shorter terms match the start of a word. Every term has to match.
+    """
+
+    def __init__(self):
+        # node id -> normalized name ("show s01e02 1080p mkv")
+        self._names = {}
+        self._trigrams = defaultdict(set)
+        self._words = defaultdict(set)
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, node_id, name):
+        """Index a node, or re-index it if its name changed"""
+        normalized = " ".join(tokenize(name))
+        if self._names.get(node_id) == normalized:
+            return
+        self.remove(node_id)
+        self._names[node_id] = normalized
+        for gram in trigrams(normalized):
+            self._trigrams[gram].add(node_id)
+        for word in set(normalized.split()):
+            self._words[word].add(node_id)
+
+    def remove(self, node_id):
+        normalized = self._names.pop(node_id, None)
+        if normalized is None:
+            return
+        for gram in trigrams(normalized):
+            self._discard(self._trigrams, gram, node_id)
+        for word in set(normalized.split()):
+            self._discard(self._words, word, node_id)
+
+    @staticmethod
+    def _discard(postings, key, node_id):
+        ids = postings.get(key)
+        if ids is not None:
+            ids.discard(node_id)
+            if not ids:
+                del postings[key]
+
+    def _word_prefix(self, term):
+        """Ids with a word starting with term (for terms too short for trigrams)"""
+        matches = set()
+        for word, ids in self._words.items():
+            if word.startswith(term):
+                matches |= ids
+        return matches
+
+    def _matches_all(self, node_id, terms):
+        # Trigrams can all be present without being contiguous, so confirm each term
+        name = " " + self._names[node_id]
+        return all((term if len(term) >= 3 else " " + term) in name for term in terms)
+
+    def _score(self, node_id, terms):
+        name = self._names[node_id]
+        words = name.split()
+        score = 0
+        for term in terms:
+            if term in words:
+                score += 3
+            elif any(word.startswith(term) for word in words):
+                score += 2
+            else:
+                score += 1
+        # Between equal scores, the shorter name is the closer match
+        return score, -len(name)
+
+    def search(self, query, limit=20):
+        """Ids of the best matches for every term in query, best first"""
+        return [node_id for _, node_id in self.ranked(query, limit)]
+
+    def ranked(self, query, limit=20):
+        """(score, id) of the best matches, best first; scores compare across indexes"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        postings = []
+        for term in set(terms):
+            if len(term) >= 3:
+                postings.extend(self._trigrams.get(gram, set()) for gram in trigrams(term))
+            else:
+                postings.append(self._word_prefix(term))
+        # Start from the rarest posting list so every intersection step stays small
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        matched = [node_id for node_id in candidates if self._matches_all(node_id, terms)]
+        return heapq.nlargest(limit, ((self._score(node_id, terms), node_id) for node_id in matched))
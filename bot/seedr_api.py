@@ -1,20 +1,182 @@
-import requests
-import time
+import asyncio
+import httpx
+import os
+import re
+from bot.account_index import AccountIndex
+from bot.cache import CacheCounters, TTLCache
+from bot.downloader import RangedDownloader
+from bot.listing import Listing, loads
+from bot.singleflight import FlightCounters, SingleFlight
+from bot.transport import SharedPool, Transport
+from bot.metrics import instrument
+from bot.config import (
+    SEEDR_BASE_URL, LOGIN_MAX_ATTEMPTS, FOLDER_CACHE_TTL, FOLDER_CACHE_SIZE, INDEX_FETCH_CONCURRENCY,
+    DOWNLOAD_WORKERS, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_RETRIES, DOWNLOAD_BANDWIDTH_LIMIT,
+    SEEDR_CONNECT_TIMEOUT, SEEDR_READ_TIMEOUT, SEEDR_LOGIN_TIMEOUT, SEEDR_DOWNLOAD_TIMEOUT,
+    SEEDR_MAX_RETRIES, SEEDR_BACKOFF_BASE, SEEDR_BACKOFF_MAX,
+    SEEDR_BREAKER_THRESHOLD, SEEDR_BREAKER_RESET, SEEDR_POOL_SIZE, SEEDR_POOL_KEEPALIVE, SEEDR_KEEPALIVE_EXPIRY
+)
+
+SEEDR_HOST = httpx.URL(SEEDR_BASE_URL).host
+
+LOGIN_ENDPOINTS = [
+    f"{SEEDR_BASE_URL}/auth/login",
+    f"{SEEDR_BASE_URL}/api/login",
+    f"{SEEDR_BASE_URL}/login",
+    f"{SEEDR_BASE_URL}/api/auth/login"
+]
+
+LOGIN_EMAIL_DOMAINS = ["gmail.com", "yahoo.com", "hotmail.com"]
+
+# Outcomes of one login attempt: logged in, credentials POST refused, or the POST went
+# through but the session can't reach the API (usually a wrong password)
+LOGIN_OK = "ok"
+LOGIN_REJECTED = "rejected"
+LOGIN_UNVERIFIED = "unverified"
+
+# Connect/read timeouts per kind of call
+TIMEOUTS = {
+    "api": httpx.Timeout(SEEDR_READ_TIMEOUT, connect=SEEDR_CONNECT_TIMEOUT),
+    "login": httpx.Timeout(SEEDR_LOGIN_TIMEOUT, connect=SEEDR_CONNECT_TIMEOUT),
+    "download": httpx.Timeout(SEEDR_DOWNLOAD_TIMEOUT, connect=SEEDR_CONNECT_TIMEOUT)
+}
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=SEEDR_POOL_SIZE,
+    max_keepalive_connections=SEEDR_POOL_KEEPALIVE,
+    keepalive_expiry=SEEDR_KEEPALIVE_EXPIRY
+)
+
+# Connections to Seedr, shared by every account
+seedr_pool = SharedPool(POOL_LIMITS)
+
+# Folder cache hits and misses of every account, for tuning FOLDER_CACHE_TTL (/metrics, /stats)
+folder_cache_totals = CacheCounters()
+
+# Reads that joined an identical one already in flight, over every account
+flight_totals = FlightCounters()
+
+
+def build_transport(client):
+    """Wrap an httpx client in the shared retry/timeout/circuit-breaker policy"""
+    return Transport(
+        client, TIMEOUTS, SEEDR_MAX_RETRIES, SEEDR_BACKOFF_BASE, SEEDR_BACKOFF_MAX,
+        SEEDR_BREAKER_THRESHOLD, SEEDR_BREAKER_RESET
+    )
+
+
+class LoginStrategyCache:
+    """Remembers which login endpoint and field format last worked"""
+
+    def __init__(self):
+        self._strategies = {}
+
+    def get(self, host, username=None):
+        """Per-user winner first, then whatever last worked for the host"""
+        return self._strategies.get((host, username)) or self._strategies.get((host, None))
+
+    def record(self, host, username, endpoint, login_field):
+        self._strategies[(host, username)] = (endpoint, login_field)
+        # Other users on the same host most likely share the endpoint, but not
+        # an email domain guessed for this particular username
+        if login_field == "username":
+            self._strategies[(host, None)] = (endpoint, login_field)
+
+    def forget(self, host, username, strategy, host_wide=True):
+        """Drop a strategy that stopped working; host_wide=False keeps it for other users"""
+        self._strategies.pop((host, username), None)
+        if host_wide and self._strategies.get((host, None)) == strategy:
+            del self._strategies[(host, None)]
+
+
+login_strategies = LoginStrategyCache()
+
 
 class SeedrAPI:
     def __init__(self, client_id="seedr_xbmc", client_secret=None):
-        self.session = requests.Session()
+        # One async client per account for its cookies; connections come from the shared pool
+        self.session = httpx.AsyncClient(
+            follow_redirects=True,
+            transport=seedr_pool,
+            event_hooks={"response": [self._on_response]}
+        )
+        # Every call to Seedr goes through the transport
+        self.transport = build_transport(self.session)
         self.access_token = None
         self.client_id = client_id
         self.client_secret = client_secret
+        # Called with this instance whenever Seedr rotates the session cookies
+        self.on_state_change = None
+        # Cookies as last exported, so unchanged Set-Cookie headers don't trigger a save
+        self._saved_cookies = None
+        self._state_save = None
+        self._state_dirty = False
+        # Folder listings keyed by folder id (None for the root)
+        self.folder_cache = TTLCache(FOLDER_CACHE_TTL, FOLDER_CACHE_SIZE, folder_cache_totals)
+        # Identical reads in flight at the same time share one request
+        self.flights = SingleFlight(flight_totals)
+        # Whole-tree id -> node map for link resolution at any depth
+        self.index = AccountIndex(self, FOLDER_CACHE_TTL, INDEX_FETCH_CONCURRENCY)
 
-    def login_with_credentials(self, username, password):
+    def _cookie_snapshot(self):
+        return [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path}
+            for c in self.session.cookies.jar
+        ]
+
+    async def _on_response(self, response):
+        if not self.on_state_change or "set-cookie" not in response.headers:
+            return
+        if self._cookie_snapshot() == self._saved_cookies:
+            return
+        # Saved in the background: the call that got new cookies doesn't wait on (or fail with) the store
+        self._state_dirty = True
+        if self._state_save is None or self._state_save.done():
+            self._state_save = asyncio.create_task(self._save_state())
+
+    async def _save_state(self):
+        # One save at a time; cookies that change mid-save are picked up by another round
+        while self._state_dirty:
+            self._state_dirty = False
+            try:
+                await self.on_state_change(self)
+            except Exception as e:
+                # Try again on the next Set-Cookie
+                self._saved_cookies = None
+                print(f"Saving rotated session cookies failed: {str(e)}")
+                return
+
+    def export_state(self):
+        """Serializable snapshot of the authenticated session"""
+        self._saved_cookies = self._cookie_snapshot()
+        return {
+            "access_token": self.access_token,
+            "cookies": list(self._saved_cookies)
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an authenticated client from export_state() output"""
+        seedr = cls()
+        seedr.access_token = state.get("access_token")
+        for cookie in state.get("cookies", []):
+            seedr.session.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain", ""), path=cookie.get("path", "/")
+            )
+        seedr._saved_cookies = seedr._cookie_snapshot()
+        return seedr
+
+    @instrument("seedr", "method")
+    async def login_with_credentials(self, username, password):
         """Enhanced login with CSRF protection and proper session handling"""
         try:
             # Step 1: Get the login page to extract CSRF token and set session cookies
             print("Getting login page...")
-            login_page = self.session.get(
-                "https://www.seedr.cc/login",
+            login_page = await self.transport.request(
+                "GET",
+                f"{SEEDR_BASE_URL}/login",
+                kind="login",
                 headers={
                     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
                 }
@@ -23,7 +185,6 @@ class SeedrAPI:
             csrf_token = None
             # Try to extract CSRF token from various possible sources
             if 'csrf' in login_page.text.lower():
-                import re
                 # Look for CSRF token in meta tags or hidden inputs
                 csrf_patterns = [
                     r'<meta name="csrf-token" content="([^"]+)"',
@@ -53,99 +214,139 @@ class SeedrAPI:
             headers = {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
                 "Content-Type": "application/x-www-form-urlencoded",
-                "Referer": "https://www.seedr.cc/login",
-                "Origin": "https://www.seedr.cc"
+                "Referer": f"{SEEDR_BASE_URL}/login",
+                "Origin": SEEDR_BASE_URL
             }
             
-            # Step 3: Try multiple login endpoints
-            login_endpoints = [
-                "https://www.seedr.cc/auth/login",
-                "https://www.seedr.cc/api/login", 
-                "https://www.seedr.cc/login",
-                "https://www.seedr.cc/api/auth/login"
-            ]
+            # Step 3: Try the login strategy that last worked for this host/user
+            cached = login_strategies.get(SEEDR_HOST, username)
+            if cached:
+                endpoint, login_field = cached
+                print(f"Trying cached login strategy: {endpoint} ({login_field})")
+                outcome = await self._attempt_login(self.transport, endpoint, username, login_field, login_data, headers)
+                if outcome == LOGIN_OK:
+                    login_strategies.record(SEEDR_HOST, username, endpoint, login_field)
+                    self.access_token = "session_auth"
+                    print("Login successful!")
+                    return self.access_token
+                # A wrong password says nothing about the endpoint other users log in with
+                login_strategies.forget(SEEDR_HOST, username, cached, host_wide=outcome == LOGIN_REJECTED)
             
-            for endpoint in login_endpoints:
-                print(f"Trying login endpoint: {endpoint}")
-                
-                response = self.session.post(endpoint, data=login_data, headers=headers)
-                print(f"Login response status: {response.status_code}")
-                
-                # Check for successful login indicators
-                if response.status_code in [200, 302]:
-                    # Test if we can access protected content
-                    test_response = self.session.get(
-                        "https://www.seedr.cc/api/folder",
-                        headers={"User-Agent": headers["User-Agent"]}
-                    )
-                    
-                    print(f"API test response: {test_response.status_code}")
-                    
-                    if test_response.status_code == 200:
-                        self.access_token = "session_auth"
-                        print("Login successful!")
-                        return self.access_token
-                    elif test_response.status_code == 401:
-                        print("API still returns 401, trying next endpoint...")
-                        continue
-                    else:
-                        print(f"Unexpected API response: {test_response.status_code}")
-                        # Try to parse response for more info
-                        try:
-                            api_data = test_response.json()
-                            if "error" in api_data:
-                                print(f"API Error: {api_data['error']}")
-                        except:
-                            pass
-                
-                # Check if login response contains error messages
-                try:
-                    if response.headers.get('content-type', '').startswith('application/json'):
-                        resp_data = response.json()
-                        if 'error' in resp_data:
-                            print(f"Login error: {resp_data['error']}")
-                        elif 'message' in resp_data:
-                            print(f"Login message: {resp_data['message']}")
-                except:
-                    pass
-            
-            # Step 4: If direct login fails, try checking if we need email instead of username
-            if "@" not in username:
-                print("Trying with email format...")
-                email_variants = [f"{username}@gmail.com", f"{username}@yahoo.com", f"{username}@hotmail.com"]
-                
-                for email in email_variants:
-                    login_data_email = login_data.copy()
-                    login_data_email["username"] = email
-                    login_data_email["email"] = email
-                    
-                    for endpoint in login_endpoints:
-                        response = self.session.post(endpoint, data=login_data_email, headers=headers)
-                        if response.status_code in [200, 302]:
-                            test_response = self.session.get("https://www.seedr.cc/api/folder")
-                            if test_response.status_code == 200:
-                                self.access_token = "session_auth"
-                                return self.access_token
+            # Step 4: Probe the remaining strategies concurrently, plain username first; first
+            # verified success wins. Email guesses are someone else's account unless the
+            # username alone fails everywhere, so they only go out after that.
+            candidates = [c for c in self._login_candidates(username) if c != cached][:LOGIN_MAX_ATTEMPTS]
+            winner = None
+            for tier in (
+                [c for c in candidates if c[1] == "username"],
+                [c for c in candidates if c[1] != "username"]
+            ):
+                winner = await self._race_login(tier, username, login_data, headers)
+                if winner:
+                    break
+            if winner:
+                endpoint, login_field = winner
+                login_strategies.record(SEEDR_HOST, username, endpoint, login_field)
+                self.access_token = "session_auth"
+                print(f"Login successful via {endpoint} ({login_field})")
+                return self.access_token
             
             raise Exception("All login attempts failed - check credentials or account status")
             
         except Exception as e:
             raise Exception(f"Login process failed: {str(e)}")
 
-    def _try_api_key_login(self, username, password):
+    def _login_candidates(self, username):
+        """Ordered (endpoint, login field) pairs to try"""
+        login_fields = ["username"]
+        if "@" not in username:
+            # Seedr may want an email instead of a username
+            login_fields += [f"email:{domain}" for domain in LOGIN_EMAIL_DOMAINS]
+        return [(endpoint, field) for field in login_fields for endpoint in LOGIN_ENDPOINTS]
+
+    async def _attempt_login(self, transport, endpoint, username, login_field, login_data, headers):
+        """POST credentials to one endpoint and verify the session can reach the API; returns a LOGIN_* outcome"""
+        data = login_data.copy()
+        if login_field.startswith("email:"):
+            email = f"{username}@{login_field.split(':', 1)[1]}"
+            data["username"] = email
+            data["email"] = email
+        
+        response = await transport.request("POST", endpoint, kind="login", data=data, headers=headers)
+        print(f"Login response from {endpoint}: {response.status_code}")
+        if response.status_code not in [200, 302]:
+            return LOGIN_REJECTED
+        
+        # Test if we can access protected content
+        test_response = await transport.request(
+            "GET",
+            f"{SEEDR_BASE_URL}/api/folder",
+            kind="login",
+            headers={"User-Agent": headers["User-Agent"]}
+        )
+        if test_response.status_code == 200:
+            return LOGIN_OK
+        
+        try:
+            api_data = test_response.json()
+            if "error" in api_data:
+                print(f"API Error from {endpoint}: {api_data['error']}")
+        except:
+            pass
+        return LOGIN_UNVERIFIED
+
+    async def _race_login(self, candidates, username, login_data, headers):
+        """Probe candidates in parallel, cancel the rest once one is verified"""
+        if not candidates:
+            return None
+        
+        async def probe(candidate):
+            # Each probe gets its own cookie jar, seeded with the login page cookies,
+            # so concurrent attempts can't clobber each other's session
+            client = httpx.AsyncClient(cookies=self.session.cookies, follow_redirects=True, transport=seedr_pool)
+            try:
+                endpoint, login_field = candidate
+                outcome = await self._attempt_login(
+                    build_transport(client), endpoint, username, login_field, login_data, headers
+                )
+                if outcome == LOGIN_OK:
+                    return candidate, client.cookies
+                return None
+            finally:
+                await client.aclose()
+        
+        print(f"Probing {len(candidates)} login strategies concurrently...")
+        pending = {asyncio.create_task(probe(candidate)) for candidate in candidates}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() or not task.result():
+                        continue
+                    candidate, cookies = task.result()
+                    self.session.cookies.update(cookies)
+                    return candidate
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _try_api_key_login(self, username, password):
         """Alternative API-based login"""
         try:
             # Some services have separate API login endpoints
             api_endpoints = [
-                "https://www.seedr.cc/api/v1/auth/login",
-                "https://www.seedr.cc/api/v2/auth/login",
-                "https://www.seedr.cc/rest/login"
+                f"{SEEDR_BASE_URL}/api/v1/auth/login",
+                f"{SEEDR_BASE_URL}/api/v2/auth/login",
+                f"{SEEDR_BASE_URL}/rest/login"
             ]
             
             for endpoint in api_endpoints:
                 try:
-                    response = self.session.post(
+                    response = await self.transport.request(
+                        "POST",
                         endpoint,
+                        kind="login",
                         json={"username": username, "password": password},
                         headers={"Content-Type": "application/json"}
                     )
@@ -189,88 +390,169 @@ class SeedrAPI:
         
         return headers
 
-    def add_torrent(self, magnet_link):
+    def _json(self, response):
+        """Decode an API response, turning overload/outage pages into clear errors"""
+        if response.status_code == 429 or response.status_code >= 500:
+            raise Exception(f"Seedr returned HTTP {response.status_code}")
+        return loads(response.content)
+
+    @instrument("seedr", "method")
+    async def add_torrent(self, magnet_link):
         """Add torrent via magnet link"""
         try:
-            response = self.session.post(
-                "https://www.seedr.cc/api/folder",
+            # Not idempotent: a retried add could queue the torrent twice
+            response = await self.transport.request(
+                "POST",
+                f"{SEEDR_BASE_URL}/api/folder",
                 headers=self._auth_headers(),
                 data={
                     "func": "add_torrent",
                     "torrent_magnet": magnet_link
                 }
             )
-            return response.json()
+            # New torrents show up in the root listing
+            self.folder_cache.invalidate(None)
+            self.index.invalidate()
+            return self._json(response)
         except Exception as e:
             raise Exception(f"Failed to add torrent: {str(e)}")
 
-    def list_contents(self, folder_id=None):
-        """List folder contents"""
+    @instrument("seedr", "method")
+    async def list_contents(self, folder_id=None):
+        """List folder contents as a Listing (cached per folder)"""
         try:
-            params = {}
-            if folder_id:
-                params["id"] = folder_id
-                
-            response = self.session.get(
-                "https://www.seedr.cc/api/folder",
-                headers=self._auth_headers(),
-                params=params
+            cache_key = str(folder_id) if folder_id else None
+            contents = self.folder_cache.get(cache_key)
+            if contents is not None:
+                return contents
+            
+            return await self.flights.do(
+                ("list_contents", cache_key),
+                lambda: self._fetch_contents(cache_key)
             )
-            return response.json()
         except Exception as e:
             raise Exception(f"Failed to list contents: {str(e)}")
 
-    def delete_item(self, item_id):
+    async def _fetch_contents(self, folder_id):
+        params = {}
+        if folder_id:
+            params["id"] = folder_id
+            
+        response = await self.transport.request(
+            "GET",
+            f"{SEEDR_BASE_URL}/api/folder",
+            headers=self._auth_headers(),
+            params=params
+        )
+        contents = Listing.parse(self._json(response))
+        if response.status_code == 200 and not contents.error:
+            self.folder_cache.set(folder_id, contents)
+        return contents
+
+    def _delete_data(self, item_ids):
+        delete_data = {
+            "func": "delete",
+        }
+        for i, id_val in enumerate(item_ids):
+            delete_data[f"delete_arr[{i}]"] = id_val
+        return delete_data
+
+    @instrument("seedr", "method")
+    async def delete_item(self, item_id):
         """Delete file or folder"""
         try:
             # Handle both single IDs and arrays
-            if isinstance(item_id, list):
-                delete_data = {
-                    "func": "delete",
-                }
-                for i, id_val in enumerate(item_id):
-                    delete_data[f"delete_arr[{i}]"] = id_val
-            else:
-                delete_data = {
-                    "func": "delete",
-                    "delete_arr[0]": item_id
-                }
+            item_ids = item_id if isinstance(item_id, list) else [item_id]
             
-            response = self.session.post(
-                "https://www.seedr.cc/api/folder",
+            # Deleting the same ids twice is harmless, so this POST may be retried
+            response = await self.transport.request(
+                "POST",
+                f"{SEEDR_BASE_URL}/api/folder",
+                retry=True,
                 headers=self._auth_headers(),
-                data=delete_data
+                data=self._delete_data(item_ids)
             )
-            return response.json()
+            self._invalidate_folders_of(item_ids)
+            return self._json(response)
         except Exception as e:
             raise Exception(f"Failed to delete item: {str(e)}")
 
-    def get_download_link(self, item_id):
-        """Get download link for file or folder"""
+    @instrument("seedr", "method")
+    async def delete_items(self, item_ids, batch_size):
+        """Delete many items in chunked POSTs; returns (chunk, result) pairs"""
+        results = []
         try:
-            contents = self.list_contents()
-            
-            # Check files
-            for file in contents.get("files", []):
-                if str(file["id"]) == str(item_id):
-                    return file.get("url")
-            
-            # Check folders (zip download)
-            for folder in contents.get("folders", []):
-                if str(folder["id"]) == str(item_id):
-                    return folder.get("zip")
-            
-            return None
+            for i in range(0, len(item_ids), batch_size):
+                chunk = item_ids[i:i + batch_size]
+                response = await self.transport.request(
+                    "POST",
+                    f"{SEEDR_BASE_URL}/api/folder",
+                    retry=True,
+                    headers=self._auth_headers(),
+                    data=self._delete_data(chunk)
+                )
+                results.append((chunk, self._json(response)))
+            return results
+        except Exception as e:
+            raise Exception(f"Failed to delete items: {str(e)}")
+        finally:
+            # One invalidation for the whole batch
+            self._invalidate_folders_of(item_ids)
+
+    def _invalidate_folders_of(self, item_ids):
+        """Drop cached listings of the deleted items and of the folders holding them"""
+        item_ids = {str(i) for i in item_ids}
+        self.index.invalidate()
+        for cache_key, contents in self.folder_cache.items():
+            if cache_key in item_ids:
+                self.folder_cache.invalidate(cache_key)
+                continue
+            if not item_ids.isdisjoint(contents.ids()):
+                self.folder_cache.invalidate(cache_key)
+
+    @instrument("seedr", "method")
+    async def get_download_link(self, item_id):
+        """Get download link for file or folder (zip) at any depth"""
+        try:
+            node = await self.index.lookup(item_id)
+            return node.link if node else None
         except Exception as e:
             raise Exception(f"Failed to get download link: {str(e)}")
 
-    def get_account_info(self):
+    @instrument("seedr", "method")
+    async def download_file(self, item_id, dest_dir, progress=None):
+        """Download a file (or a folder as zip) into dest_dir with parallel ranged requests"""
+        node = await self.index.lookup(item_id)
+        if not node or not node.link:
+            raise Exception("File not found or no download link available")
+        
+        name = os.path.basename(node.name) + (".zip" if node.is_folder else "")
+        os.makedirs(dest_dir, exist_ok=True)
+        downloader = RangedDownloader(
+            self.transport,
+            workers=DOWNLOAD_WORKERS,
+            chunk_size=DOWNLOAD_CHUNK_SIZE,
+            retries=DOWNLOAD_RETRIES,
+            bandwidth_limit=DOWNLOAD_BANDWIDTH_LIMIT
+        )
+        return await downloader.download(node.link, os.path.join(dest_dir, name), progress)
+
+    @instrument("seedr", "method")
+    async def get_account_info(self):
         """Get account information"""
         try:
-            response = self.session.get(
-                "https://www.seedr.cc/api/settings",
-                headers=self._auth_headers()
-            )
-            return response.json()
+            return await self.flights.do(("get_account_info",), self._fetch_account_info)
         except Exception as e:
             raise Exception(f"Failed to get account info: {str(e)}")
+
+    async def _fetch_account_info(self):
+        response = await self.transport.request(
+            "GET",
+            f"{SEEDR_BASE_URL}/api/settings",
+            headers=self._auth_headers()
+        )
+        return self._json(response)
+
+    async def close(self):
+        """Close this account's client; the shared pool stays open"""
+        await self.session.aclose()
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+class SessionStore(ABC):
+    """Where authenticated Seedr sessions live between restarts"""
+
+    @abstractmethod
+    async def load(self, user_id):
+        """Return the saved session record for a user, or None"""
+
+    @abstractmethod
+    async def save(self, user_id, record):
+        """Insert or replace the session record for a user"""
+
+    @abstractmethod
+    async def delete(self, user_id):
+        """Forget a user's session"""
+
+    @abstractmethod
+    async def recent(self, limit):
+        """Ids of the users whose sessions were saved most recently"""
+
+    async def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store; sessions survive re-creating SeedrAPI but not a restart"""
+
+    def __init__(self):
+        self._records = {}
+
+    async def load(self, user_id):
+        record = self._records.get(user_id)
+        return dict(record) if record else None
+
+    async def save(self, user_id, record):
+        self._records[user_id] = dict(record, updated_at=time.time())
+
+    async def delete(self, user_id):
+        self._records.pop(user_id, None)
+
+    async def recent(self, limit):
+        by_age = sorted(self._records.items(), key=lambda item: item[1]["updated_at"], reverse=True)
+        return [user_id for user_id, _ in by_age[:limit]]
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store in WAL mode so reads never wait on the writer"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id INTEGER PRIMARY KEY, "
+            "data TEXT NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at)")
+
+    def _load(self, user_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, user_id, record):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)",
+                (user_id, json.dumps(record), time.time())
+            )
+
+    def _delete(self, user_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+
+    def _recent(self, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id FROM sessions ORDER BY updated_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    # sqlite3 is blocking, so keep it off the event loop
+    async def load(self, user_id):
+        return await asyncio.to_thread(self._load, user_id)
+
+    async def save(self, user_id, record):
+        await asyncio.to_thread(self._save, user_id, record)
+
+    async def delete(self, user_id):
+        await asyncio.to_thread(self._delete, user_id)
+
+    async def recent(self, limit):
+        return await asyncio.to_thread(self._recent, limit)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_session_store(backend, path=None):
+    """Build the session store selected in config"""
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(path)
+    raise Exception(f"Unknown session backend: {backend}")
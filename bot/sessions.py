@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class Session:
+    """A user's live session: their Seedr accounts and the chat notices go to"""
+
+    __slots__ = ("accounts", "authorized", "chat_id", "last_used")
+
+    def __init__(self, accounts, chat_id=None):
+        self.accounts = accounts
+        self.authorized = True
+        self.chat_id = chat_id
+        self.last_used = time.monotonic()
+
+
+class SessionCache:
+    """Live sessions by user id, least recently used first.
+
+    Sessions beyond maxsize, or unused for idle_ttl seconds, are evicted on
+    the next access (0 disables either limit) unless keep(session) says they
+    are still needed. Evicted sessions are handed to on_evict(user_id,
+    session), which saves them so they can be rebuilt from the store later.
+    """
+
+    def __init__(self, maxsize, idle_ttl):
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self.keep = None
+        self.on_evict = None
+        self.evictions = 0
+        self._sessions = OrderedDict()
+        self._saving = set()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, user_id):
+        return user_id in self._sessions
+
+    def get(self, user_id):
+        session = self._sessions.get(user_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(user_id)
+        self._evict()
+        return session
+
+    def setdefault(self, user_id, session):
+        """The live session for user_id, adding `session` if there is none"""
+        existing = self.get(user_id)
+        if existing is not None:
+            return existing
+        self._sessions[user_id] = session
+        self._evict()
+        return session
+
+    def pop(self, user_id, default=None):
+        return self._sessions.pop(user_id, default)
+
+    def items(self):
+        """(user id, session) pairs, without touching LRU order"""
+        return list(self._sessions.items())
+
+    def values(self):
+        return list(self._sessions.values())
+
+    def clear(self):
+        self._sessions.clear()
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest first; stop at the first session that may stay
+        for _ in range(len(self._sessions)):
+            user_id, session = next(iter(self._sessions.items()))
+            over = self.maxsize and len(self._sessions) > self.maxsize
+            idle = self.idle_ttl and now - session.last_used > self.idle_ttl
+            if not (over or idle):
+                return
+            if self.keep and self.keep(session):
+                self._sessions.move_to_end(user_id)
+                continue
+            del self._sessions[user_id]
+            self.evictions += 1
+            if self.on_evict:
+                task = asyncio.get_running_loop().create_task(self.on_evict(user_id, session))
+                self._saving.add(task)
+                task.add_done_callback(self._saving.discard)
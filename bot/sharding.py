@@ -0,0 +1,106 @@
+import bisect
+import hashlib
+import multiprocessing
+import queue
+
+
+class HashRing:
+    """Consistent hash ring; changing the number of nodes only moves ~1/N of the keys"""
+
+    def __init__(self, nodes, replicas=64):
+        ring = sorted((self._hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas))
+        self._hashes = [h for h, _ in ring]
+        self._nodes = [node for _, node in ring]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+    def node_for(self, key):
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+def shard_key(update):
+    """The user an update belongs to, so all of a user's updates land on one worker"""
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return update.update_id
+
+
+class ShardRouter:
+    """Forwards each update to the worker process that owns its user, restarting dead workers"""
+
+    def __init__(self, workers, target, metrics_port=0):
+        # spawn, not fork: workers must open their own session store and HTTP pools
+        self._mp = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.target = target
+        self.metrics_port = metrics_port
+        self.ring = HashRing(range(workers))
+        self.queues = [self._mp.Queue() for _ in range(workers)]
+        self.processes = [None] * workers
+        self.restarts = 0
+
+    def _spawn(self, index):
+        # Each worker serves its own metrics on the next port up
+        metrics_port = self.metrics_port + index if self.metrics_port else 0
+        process = self._mp.Process(
+            target=self.target,
+            args=(index, self.workers, self.queues[index], metrics_port),
+            name=f"shard-{index}",
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def route(self, update):
+        index = self.ring.node_for(shard_key(update))
+        if not self.processes[index].is_alive():
+            # Its sessions are in the shared store, so the replacement picks them up on demand
+            print(f"⚠️ Worker {index} exited with code {self.processes[index].exitcode}, restarting")
+            self.restarts += 1
+            # A worker killed inside queue.get() leaves the queue's read lock held,
+            # so the replacement gets a fresh queue
+            self.queues[index].close()
+            self.queues[index] = self._mp.Queue()
+            self._spawn(index)
+        self.queues[index].put(update.to_dict())
+        return index
+
+    async def handle(self, update, context):
+        """Handler callback for the router application"""
+        self.route(update)
+
+    def stop(self, timeout=10):
+        for index, process in enumerate(self.processes):
+            if process and process.is_alive():
+                # None asks the worker to finish what it has and exit
+                self.queues[index].put(None)
+        for process in self.processes:
+            if process is None:
+                continue
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for q in self.queues:
+            q.close()
+
+
+def read_updates(updates, deliver, stopped):
+    """Worker side: pump routed updates into the event loop (runs in a thread)"""
+    while True:
+        try:
+            data = updates.get()
+        except (EOFError, OSError, queue.Empty):
+            data = None
+        if data is None:
+            stopped()
+            return
+        deliver(data)
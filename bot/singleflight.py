@@ -0,0 +1,46 @@
+import asyncio
+
+
+class FlightCounters:
+    """Calls and coalesced calls summed over many SingleFlight instances"""
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+
+    def stats(self):
+        return {"calls": self.calls, "coalesced": self.coalesced}
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight request; counts also go to totals"""
+
+    def __init__(self, totals=None):
+        self.calls = 0
+        self.coalesced = 0
+        self.totals = totals
+        self._inflight = {}
+
+    async def do(self, key, fn):
+        """Await fn() once per key; callers arriving meanwhile get the same result"""
+        self.calls += 1
+        if self.totals:
+            self.totals.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            if self.totals:
+                self.totals.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller must not cancel the request the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight)
+        }
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from bot.seedr_api import seedr_pool
+from bot.config import (
+    SEEDR_BASE_URL, SEEDR_CONNECT_TIMEOUT, SEEDR_KEEPALIVE_EXPIRY, SEEDR_WARM_CONNECTIONS,
+    STARTUP_RESTORE_LIMIT, STARTUP_RESTORE_CONCURRENCY, STARTUP_TIMEOUT
+)
+
+
+async def restore_sessions(user_ids, restore, concurrency, timeout):
+    """Await restore(user_id) for each id, `concurrency` at a time; returns (restored, failed, skipped).
+
+    restore returns True for a session that is usable. Whatever hasn't
+    finished after timeout seconds is left to be restored on first use.
+    """
+    if not user_ids:
+        return 0, 0, 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(user_id):
+        async with slots:
+            return await restore(user_id)
+
+    tasks = [asyncio.create_task(one(user_id)) for user_id in user_ids]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    restored = sum(1 for task in done if task.exception() is None and task.result())
+    return restored, len(done) - restored, len(pending)
+
+
+async def warm_up(session_store, restore, owns=None):
+    """Open connections to Seedr and restore recent sessions; returns what /readyz reports.
+
+    owns(user_id) limits the restore to the users this process serves.
+    """
+    started = time.monotonic()
+    connections = await seedr_pool.warm(SEEDR_BASE_URL, SEEDR_WARM_CONNECTIONS, SEEDR_CONNECT_TIMEOUT)
+    # Idle connections would otherwise expire before the first users show up
+    seedr_pool.keep_warm(SEEDR_BASE_URL, SEEDR_WARM_CONNECTIONS, SEEDR_CONNECT_TIMEOUT, SEEDR_KEEPALIVE_EXPIRY / 2)
+    warmed_at = time.monotonic()
+
+    user_ids = await session_store.recent(STARTUP_RESTORE_LIMIT)
+    if owns is not None:
+        user_ids = [user_id for user_id in user_ids if owns(user_id)]
+    restored, failed, skipped = await restore_sessions(
+        user_ids, restore, STARTUP_RESTORE_CONCURRENCY, max(0.0, STARTUP_TIMEOUT - (warmed_at - started))
+    )
+
+    return {
+        "warm_connections": connections,
+        "sessions_restored": restored,
+        "sessions_failed": failed,
+        "sessions_deferred": skipped,
+        "pool_seconds": round(warmed_at - started, 3),
+        "restore_seconds": round(time.monotonic() - warmed_at, 3)
+    }
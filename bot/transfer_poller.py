@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+from bot.outbox import BACKGROUND
+
+
+class TransferPoller:
+    """One background loop that watches every account's transfers and pushes notices.
+
+    Each account has its own schedule: polled every active_interval seconds
+    while it has transfers running, backing off up to idle_max_interval while
+    it has none, so idle accounts cost little however many there are.
+    """
+
+    def __init__(self, sessions, active_interval, idle_max_interval):
+        self.sessions = sessions
+        self.active_interval = active_interval
+        self.idle_max_interval = idle_max_interval
+        self.bot = None
+        # account -> {torrent id: Torrent} as of the previous poll
+        self._transfers = {}
+        # account -> (monotonic time of its next poll, its current interval)
+        self._schedule = {}
+        self._task = None
+        self._wakeup = asyncio.Event()
+        # Awaited as on_finished(bot, account, seedr) when transfers leave an account's list
+        self.on_finished = None
+
+    def start(self, bot):
+        self.bot = bot
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def wake(self, account=None):
+        """A transfer was just started on account (None: any): poll it soon and at the active rate"""
+        now = time.monotonic()
+        for name in [account] if account is not None else list(self._schedule):
+            self._schedule[name] = (now, self.active_interval)
+        self._wakeup.set()
+
+    def is_active(self, account):
+        """True while the account had transfers running at the last poll"""
+        return bool(self._transfers.get(account))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"Transfer poll failed: {str(e)}")
+
+            # Sleep until the next account is due; look again at the active rate anyway,
+            # so accounts of new sessions are picked up
+            now = time.monotonic()
+            next_due = min((due for due, _ in self._schedule.values()), default=now + self.active_interval)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, min(next_due - now, self.active_interval)))
+            except asyncio.TimeoutError:
+                pass
+
+    def _accounts(self):
+        """Group authorized sessions by Seedr account so each account is polled once"""
+        accounts = {}
+        for user_id, session in list(self.sessions.items()):
+            if not session.authorized:
+                continue
+            for account, seedr in session.accounts.items():
+                _, chat_ids = accounts.setdefault(account, (seedr, []))
+                chat_ids.append(session.chat_id or user_id)
+        return accounts
+
+    async def poll_once(self):
+        """Poll the accounts that are due, concurrently; returns True if any of them has an active transfer"""
+        accounts = self._accounts()
+        # Accounts that are gone (logged out, evicted) no longer need state
+        for account in set(self._transfers) - set(accounts):
+            del self._transfers[account]
+        for account in set(self._schedule) - set(accounts):
+            del self._schedule[account]
+
+        now = time.monotonic()
+        # Accounts seen for the first time are due at once
+        due = [account for account in accounts if self._schedule.get(account, (now, None))[0] <= now]
+        results = await asyncio.gather(
+            *(self._poll_account(account, *accounts[account]) for account in due),
+            return_exceptions=True
+        )
+
+        now = time.monotonic()
+        for account, result in zip(due, results):
+            if isinstance(result, Exception):
+                print(f"Transfer poll failed for {account}: {str(result)}")
+            # Poll quickly while something is downloading, back off while idle (or failing)
+            if result is True:
+                interval = self.active_interval
+            else:
+                interval = min(self._schedule.get(account, (0, self.active_interval / 2))[1] * 2, self.idle_max_interval)
+            self._schedule[account] = (now + interval, interval)
+        return any(result is True for result in results)
+
+    async def _poll_account(self, account, seedr, chat_ids):
+        # Always read the live root listing; this also refreshes the cache users see
+        seedr.folder_cache.invalidate(None)
+        contents = await seedr.list_contents()
+
+        current = {torrent.id: torrent for torrent in contents.torrents}
+        previous = self._transfers.get(account)
+        self._transfers[account] = current
+        if previous is None:
+            # First sight of this account: nothing to compare against yet
+            return bool(current)
+
+        folder_names = {folder.name for folder in contents.folders}
+        notices = []
+
+        for torrent_id, torrent in previous.items():
+            if torrent_id in current:
+                continue
+            if torrent.name in folder_names:
+                notices.append(f"✅ Download complete: {torrent.name}")
+            else:
+                notices.append(f"⚠️ Torrent removed before finishing: {torrent.name}")
+
+        for torrent_id, torrent in current.items():
+            before = previous.get(torrent_id)
+            if torrent.failed and not (before and before.failed):
+                reason = torrent.warnings or "stopped"
+                notices.append(f"❌ Torrent failed: {torrent.name} ({reason})")
+
+        if notices:
+            seedr.index.invalidate()
+            for chat_id in chat_ids:
+                for notice in notices:
+                    await self._notify(chat_id, notice)
+
+        if self.on_finished and any(torrent_id not in current for torrent_id in previous):
+            # Finished or removed transfers change the account's free space
+            try:
+                await self.on_finished(self.bot, account, seedr)
+            except Exception as e:
+                print(f"Finished-transfer hook failed for {account}: {str(e)}")
+
+        return any(not torrent.failed for torrent in current.values())
+
+    async def _notify(self, chat_id, text):
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text, rate_limit_args={"priority": BACKGROUND})
+        except Exception as e:
+            print(f"Failed to notify {chat_id}: {str(e)}")
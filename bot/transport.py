@@ -0,0 +1,199 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from bot.metrics import metrics, span
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host that keeps failing"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, lets one trial call through after a cooldown"""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    def before_call(self, host):
+        if self.opened_at is None:
+            return
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if remaining > 0:
+            raise CircuitOpenError(f"{host} is unavailable, retry in {int(remaining) + 1}s")
+        # Half-open: this call is the trial; a failure re-opens the circuit
+        self.opened_at = time.monotonic()
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+# Shared by every account so one user's failures protect all the others
+_breakers = {}
+
+
+def breaker_for(host, failure_threshold, reset_timeout):
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = _breakers[host] = CircuitBreaker(failure_threshold, reset_timeout)
+    return breaker
+
+
+def _retry_after(response):
+    """Seconds requested by a Retry-After header, if any"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Transport:
+    """Timeouts, retries with backoff and a per-host circuit breaker over an httpx client"""
+
+    def __init__(self, client, timeouts, max_retries, backoff_base, backoff_max,
+                 failure_threshold, reset_timeout):
+        self.client = client
+        self.timeouts = timeouts
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    def _breaker(self, url):
+        return breaker_for(httpx.URL(url).host, self.failure_threshold, self.reset_timeout)
+
+    def _backoff(self, attempt, response=None):
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter keeps many clients from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, method, url, kind="api", retry=None, call=None, **kwargs):
+        """Send a request; idempotent ones (or retry=True) are retried on 429/5xx and network errors.
+
+        Status codes are counted per `call`, by default the instrumented SeedrAPI method making it.
+        """
+        method = method.upper()
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        attempts = self.max_retries + 1 if retry else 1
+        breaker = self._breaker(url)
+
+        for attempt in range(attempts):
+            breaker.before_call(httpx.URL(url).host)
+            try:
+                async with span(f"http {method} {httpx.URL(url).path}"):
+                    response = await self.client.request(method, url, timeout=self.timeouts[kind], **kwargs)
+            except httpx.TransportError as e:
+                metrics.observe_status(kind, "error", call)
+                breaker.record_failure()
+                if attempt + 1 >= attempts:
+                    if isinstance(e, httpx.TimeoutException):
+                        raise Exception(f"Seedr request timed out ({kind})")
+                    raise Exception(f"Seedr connection error: {e.__class__.__name__}")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            metrics.observe_status(kind, response.status_code, call)
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if response.status_code in RETRY_STATUSES and attempt + 1 < attempts:
+                await asyncio.sleep(self._backoff(attempt, response))
+                continue
+            return response
+
+    @asynccontextmanager
+    async def stream(self, method, url, kind="download", call=None, **kwargs):
+        """Streaming request guarded by the breaker; callers handle their own retries"""
+        breaker = self._breaker(url)
+        breaker.before_call(httpx.URL(url).host)
+        try:
+            async with self.client.stream(method, url, timeout=self.timeouts[kind], **kwargs) as response:
+                metrics.observe_status(kind, response.status_code, call)
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                yield response
+        except httpx.TransportError:
+            metrics.observe_status(kind, "error", call)
+            breaker.record_failure()
+            raise
+
+
+class SharedPool(httpx.AsyncBaseTransport):
+    """One connection pool under every account's client.
+
+    Each account keeps its own AsyncClient (and cookie jar) on top of it, so
+    connections - and their TLS handshakes - are reused across users. Closing
+    a client leaves the pool open for the others.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self._transport = httpx.AsyncHTTPTransport(limits=limits)
+        self._keep_warm = None
+
+    async def handle_async_request(self, request):
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        # Called whenever an account's client closes; the pool outlives them
+        pass
+
+    async def warm(self, url, connections, timeout):
+        """Open up to `connections` connections to url's host; returns how many answered"""
+        client = httpx.AsyncClient(transport=self, timeout=timeout)
+        try:
+            # Requests in flight at the same time each need their own connection
+            results = await asyncio.gather(
+                *(client.head(url) for _ in range(connections)), return_exceptions=True
+            )
+        finally:
+            await client.aclose()
+        return sum(1 for result in results if not isinstance(result, Exception))
+
+    def keep_warm(self, url, connections, timeout, interval):
+        """Re-warm every interval so idle connections don't expire between bursts"""
+        async def run():
+            while True:
+                await asyncio.sleep(interval)
+                await self.warm(url, connections, timeout)
+
+        if self._keep_warm:
+            self._keep_warm.cancel()
+        self._keep_warm = asyncio.create_task(run())
+
+    async def reset(self):
+        """Close every pooled connection (at shutdown, or to simulate a restart)"""
+        if self._keep_warm:
+            self._keep_warm.cancel()
+            self._keep_warm = None
+        await self._transport.aclose()
+        self._transport = httpx.AsyncHTTPTransport(limits=self.limits)
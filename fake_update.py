@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Post fake Telegram updates to a locally running webhook (python main.py --mode webhook)
+"""
+
+import argparse
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+update_ids = itertools.count(int(time.time()))
+
+def build_update(user_id, text):
+    """Minimal Telegram Update JSON for a private text message"""
+    update_id = next(update_ids)
+    entities = []
+    if text.startswith("/"):
+        entities.append({"type": "bot_command", "offset": 0, "length": len(text.split()[0])})
+
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": "Test"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+            "entities": entities
+        }
+    }
+
+def post_update(url, secret, update):
+    """Send one update the way Telegram does and return (status, seconds)"""
+    started = time.perf_counter()
+    response = requests.post(
+        url,
+        json=update,
+        headers={"X-Telegram-Bot-Api-Secret-Token": secret},
+        timeout=30
+    )
+    return response.status_code, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--url", default="http://127.0.0.1:8443/telegram", help="webhook URL")
+    parser.add_argument("--secret", required=True, help="value of WEBHOOK_SECRET")
+    parser.add_argument("--text", default="/start", help="message text or command")
+    parser.add_argument("--users", type=int, default=1, help="distinct fake user ids")
+    parser.add_argument("--count", type=int, default=1, help="updates to send")
+    parser.add_argument("--concurrency", type=int, default=1, help="updates in flight at once")
+    args = parser.parse_args()
+
+    updates = [build_update(1000 + i % args.users, args.text) for i in range(args.count)]
+
+    print(f"📨 Posting {args.count} update(s) to {args.url}")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda u: post_update(args.url, args.secret, u), updates))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(seconds for _, seconds in results)
+
+    print(f"   Status codes: {statuses}")
+    print(f"   Accepted in {elapsed:.2f}s ({args.count / elapsed:.1f} updates/s)")
+    print(f"   Median post latency: {latencies[len(latencies) // 2] * 1000:.1f} ms")
+    # Replies go to the real Bot API and fail for fake chats - check the bot's log for handling
+
+if __name__ == "__main__":
+    main()
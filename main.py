@@ -1,32 +1,218 @@
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
-from bot.config import TELEGRAM_TOKEN
-from bot.handlers import start, authorize, list_files, get_link, delete_item, handle_text
+import argparse
+import asyncio
+import signal
+import threading
+import time
 
-def main():
-    if not TELEGRAM_TOKEN:
-        print("❌ Error: TELEGRAM_BOT_TOKEN not found in environment variables")
-        return
+from telegram import Update
+from telegram.ext import (
+    ApplicationBuilder, CallbackQueryHandler, CommandHandler, InlineQueryHandler, MessageHandler,
+    TypeHandler, filters
+)
+from bot.config import (
+    TELEGRAM_TOKEN, MAX_CONCURRENT_UPDATES, TG_GLOBAL_RATE, TG_CHAT_INTERVAL, TG_GROUP_INTERVAL,
+    METRICS_HOST, METRICS_PORT, SESSION_BACKEND, WORKERS,
+    WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH
+)
+from bot.outbox import OutboxRateLimiter
+from bot.metrics import metrics, readiness, start_metrics_server
+from bot.seedr_api import seedr_pool, folder_cache_totals, flight_totals
+from bot.sharding import HashRing, ShardRouter, read_updates
+from bot.startup import warm_up
+from bot.handlers import (
+    start, authorize, list_files, browse_callback, search, inline_search, get_link, send_file, download_item,
+    delete_item, show_queue, list_accounts, show_jobs, handle_text, add_document, stats,
+    transfer_poller, job_queue, user_sessions, session_store, restore_session, restore_held_magnets
+)
+
+async def post_init(app, metrics_port=METRICS_PORT, shard=None, shard_of=None):
+    """Warm up before the first update is taken; a worker process only restores and runs its own shard's users"""
+    owns = None if shard_of is None else (lambda user_id: shard_of(user_id) == shard)
+    outbox = app.bot.rate_limiter
+    metrics.register_gauge("telegram_outbox_queue_depth", lambda: outbox.stats()["queue_depth"])
+    metrics.register_counter("telegram_outbox_sent_total", lambda: outbox.sent)
+    metrics.register_gauge("telegram_outbox_max_delay_seconds", lambda: outbox.max_delay)
+    metrics.register_gauge("bot_active_sessions", lambda: len(user_sessions))
+    metrics.register_gauge("bot_jobs_running", lambda: job_queue.running)
+    metrics.register_gauge("bot_ready", lambda: int(readiness.ready))
+    metrics.register_counter("seedr_folder_cache_hits_total", lambda: folder_cache_totals.hits)
+    metrics.register_counter("seedr_folder_cache_misses_total", lambda: folder_cache_totals.misses)
+    metrics.register_counter("seedr_reads_total", lambda: flight_totals.calls)
+    metrics.register_counter("seedr_reads_coalesced_total", lambda: flight_totals.coalesced)
+    if metrics_port:
+        # Up first, so /readyz answers 503 while warming up
+        await start_metrics_server(METRICS_HOST, metrics_port)
+        print(f"📈 Metrics on http://{METRICS_HOST}:{metrics_port}/metrics (health: /healthz, /readyz)")
+    
+    # Connections to Seedr and recent sessions are ready before the first update arrives
+    started = time.monotonic()
+    details = await warm_up(session_store, restore_session, owns)
     
-    print("🤖 Starting Seedr Telegram Bot...")
+    transfer_poller.start(app.bot)
+    # Jobs left unfinished by the last run are picked up again here
+    await job_queue.start(app.bot, shard, shard_of)
+    # So are magnets that were waiting for free space
+    details["held_magnets"] = await restore_held_magnets(app.bot)
     
-    # Create application
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    readiness.mark_ready(startup_seconds=round(time.monotonic() - started, 3), **details)
+    print(
+        f"✅ Ready in {readiness.details['startup_seconds']}s: {details['warm_connections']} warm connections, "
+        f"{details['sessions_restored']} sessions restored ({details['sessions_failed']} failed, "
+        f"{details['sessions_deferred']} deferred)"
+    )
+
+async def post_shutdown(app):
+    # Running jobs go back to the queue for the next start
+    await job_queue.stop()
+    await transfer_poller.stop()
+    await seedr_pool.reset()
+
+def build_application(request=None):
+    """Create the application with every handler registered"""
+    # Updates are processed concurrently (up to the limit) so one slow
+    # Seedr round trip doesn't hold up every other user
+    builder = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .concurrent_updates(MAX_CONCURRENT_UPDATES)
+        # Every outgoing message is scheduled around Telegram's flood limits
+        .rate_limiter(OutboxRateLimiter(TG_GLOBAL_RATE, TG_CHAT_INTERVAL, TG_GROUP_INTERVAL))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if request is not None:
+        # The benchmarks answer Bot API calls locally
+        builder = builder.request(request)
+    app = builder.build()
 
     # Add command handlers
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("authorize", authorize))
     app.add_handler(CommandHandler("list", list_files))
+    app.add_handler(CommandHandler("search", search))
     app.add_handler(CommandHandler("getlink", get_link))
+    app.add_handler(CommandHandler("send", send_file))
+    app.add_handler(CommandHandler("download", download_item))
     app.add_handler(CommandHandler("delete", delete_item))
+    app.add_handler(CommandHandler("queue", show_queue))
+    app.add_handler(CommandHandler("accounts", list_accounts))
+    app.add_handler(CommandHandler("jobs", show_jobs))
+    app.add_handler(CommandHandler("stats", stats))
+    
+    # /list navigation buttons
+    app.add_handler(CallbackQueryHandler(browse_callback, pattern=r"^ls:"))
+    
+    # @bot <words> from any chat
+    app.add_handler(InlineQueryHandler(inline_search))
     
     # Add message handler for non-command text (magnet links)
     app.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), handle_text))
+    
+    # Uploaded .torrent files and .txt lists of magnets
+    app.add_handler(MessageHandler(
+        filters.Document.FileExtension("torrent") | filters.Document.FileExtension("txt"),
+        add_document
+    ))
+    return app
+
+def run_worker(index, workers, updates, metrics_port):
+    """Entry point of a worker process: handle the updates routed to this shard"""
+    # The router owns Ctrl+C and tells workers to stop through their queue
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_shard(index, workers, updates, metrics_port))
+
+async def _serve_shard(index, workers, updates, metrics_port):
+    app = build_application()
+    await app.initialize()
+    # Only this shard's users are restored here; the router sends the others elsewhere
+    ring = HashRing(range(workers))
+    await post_init(app, metrics_port, index, ring.node_for)
+    await app.start()
+    print(f"✅ Worker {index} ready")
+
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+
+    def deliver(data):
+        app.update_queue.put_nowait(Update.de_json(data, app.bot))
+
+    threading.Thread(
+        target=read_updates,
+        args=(
+            updates,
+            lambda data: loop.call_soon_threadsafe(deliver, data),
+            lambda: loop.call_soon_threadsafe(stopped.set)
+        ),
+        daemon=True
+    ).start()
+
+    await stopped.wait()
+    await app.stop()
+    await post_shutdown(app)
+    await app.shutdown()
+
+def build_router(workers):
+    """Application that only receives updates and hands each to its user's worker"""
+    router = ShardRouter(workers, run_worker, METRICS_PORT)
+
+    async def start_workers(app):
+        router.start()
+        print(f"🔀 Routing updates to {workers} workers")
+
+    async def stop_workers(app):
+        router.stop()
+
+    app = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .post_init(start_workers)
+        .post_shutdown(stop_workers)
+        .build()
+    )
+    app.add_handler(TypeHandler(Update, router.handle))
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Seedr Telegram Bot")
+    parser.add_argument(
+        "--mode", choices=["polling", "webhook"], default="polling",
+        help="receive updates by long-polling or through an embedded webhook server"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=WORKERS,
+        help="worker processes; each user's updates always go to the same one"
+    )
+    args = parser.parse_args()
+
+    if not TELEGRAM_TOKEN:
+        print("❌ Error: TELEGRAM_BOT_TOKEN not found in environment variables")
+        return
+    if args.mode == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET):
+        print("❌ Error: webhook mode needs WEBHOOK_URL and WEBHOOK_SECRET")
+        return
+    
+    if args.workers > 1 and SESSION_BACKEND == "memory":
+        print("❌ Error: multiple workers need a shared session store (SESSION_BACKEND=sqlite)")
+        return
+    
+    print(f"🤖 Starting Seedr Telegram Bot ({args.mode})...")
+    
+    app = build_router(args.workers) if args.workers > 1 else build_application()
 
-    print("✅ Bot is running and ready to receive messages...")
     print("Press Ctrl+C to stop the bot")
     
     try:
-        app.run_polling()
+        if args.mode == "webhook":
+            # Telegram signs every request with the secret token; anything else gets a 403
+            app.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}"
+            )
+        else:
+            app.run_polling()
     except KeyboardInterrupt:
         print("\n🛑 Bot stopped by user")
     except Exception as e: